@@ -0,0 +1,176 @@
+"""API HTTP asynchrone de génération (Flask).
+
+    POST /jobs                   -> 202 {"job_id": ...}  (multipart : cv + champs, ou JSON avec cv_markdown)
+                                    503 + Retry-After si la file d'attente est pleine
+                                    (regenerate=true : ignore une lettre identique déjà générée ;
+                                    review_mode=ciblée|rapide|complète, voir pipeline.REVIEW_MODES)
+    GET  /jobs/<id>              -> statut, progression, durées
+    GET  /jobs/<id>/letter.md    -> lettre finale (markdown)
+    GET  /jobs/<id>/letter.docx  -> lettre finale (Word)
+    GET  /jobs/<id>/letter.pdf   -> lettre finale (PDF, générée à la demande)
+    GET  /metrics                -> durées des étapes, outils et appels LLM, file d'attente (format Prometheus)
+
+Lancement : gunicorn -w 1 --threads 8 -b 0.0.0.0:8080 api:app
+Les jobs vivent dans la mémoire du process : un seul worker gunicorn par
+conteneur, la montée en charge se fait en ajoutant des conteneurs.
+"""
+import io
+import os
+
+from flask import Flask, Response, jsonify, request, send_file
+
+import jobs
+import pipeline
+import tracing
+import utils
+
+
+app = Flask(__name__)
+# Délai conseillé (s) après un refus pour file d'attente pleine
+RETRY_AFTER = int(os.getenv("RETRY_AFTER_SECONDS", "30"))
+# Température maximale acceptée par les API compatibles OpenAI
+MAX_TEMPERATURE = 2.0
+os.environ.setdefault("OPENAI_MODEL_NAME", utils.DEFAULT_MODEL)
+if os.getenv("WARMUP") == "1":
+    utils.warm_up()
+
+
+def _error(message, status):
+    return jsonify({"error": message}), status
+
+
+def _job_or_404(job_id):
+    job = jobs.manager.get(job_id)
+    if job is None:
+        return None, _error("Job inconnu", 404)
+    return job, None
+
+
+@app.get("/healthz")
+def healthz():
+    return jsonify({"status": "ok"})
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(tracing.metrics_text(), mimetype="text/plain; version=0.0.4")
+
+
+@app.post("/jobs")
+def submit_job():
+    # Conversion du CV et génération partagent un identifiant : celui du job
+    with tracing.request():
+        return _submit_job()
+
+
+def _submit_job():
+    # File pleine : refus avant de lire et convertir le CV
+    if jobs.manager.full():
+        return _busy("File d'attente pleine")
+    if request.is_json:
+        payload = request.get_json()
+        cv_md = payload.get("cv_markdown")
+    else:
+        payload = request.form
+        cv_file = request.files.get("cv")
+        try:
+            cv_md = utils.convert_cv_bytes(cv_file.read(), cv_file.filename) if cv_file else None
+        except ValueError as e:
+            return _error(str(e), 400)
+
+    company = payload.get("company")
+    job_description = payload.get("job_description")
+    if not cv_md or not company or not job_description:
+        return _error("Champs requis : cv (ou cv_markdown), company, job_description", 400)
+
+    review_mode = payload.get("review_mode") or None
+    if review_mode not in (None, *pipeline.REVIEW_MODES):
+        return _error(f"review_mode : {', '.join(pipeline.REVIEW_MODES)}", 400)
+
+    temperatures = {}
+    for agent_name in pipeline.DEFAULT_TEMPERATURES:
+        field = f"temperature_{agent_name}"
+        if payload.get(field) in (None, ""):
+            continue
+        try:
+            temperature = float(payload[field])
+        except (TypeError, ValueError):
+            temperature = None
+        # La comparaison écarte aussi nan et inf
+        if temperature is None or not 0 <= temperature <= MAX_TEMPERATURE:
+            return _error(f"{field} : nombre entre 0 et {MAX_TEMPERATURE:g}", 400)
+        temperatures[agent_name] = temperature
+    try:
+        job = jobs.manager.submit(
+            pipeline.generate_letter,
+            cv_md,
+            company,
+            job_description,
+            candidate_profile=payload.get("candidate_profile", ""),
+            gender=payload.get("gender", "féminin"),
+            temperatures=temperatures,
+            include_draft=str(payload.get("include_draft", "true")).lower() in ("1", "true", "yes", "oui"),
+            regenerate=str(payload.get("regenerate", "false")).lower() in ("1", "true", "yes", "oui"),
+            review_mode=review_mode,
+        )
+    except jobs.QueueFullError as e:
+        return _busy(str(e))
+    return jsonify({"job_id": job.id, "status_url": f"/jobs/{job.id}"}), 202
+
+
+def _busy(message):
+    """503 + Retry-After : le client (ou le répartiteur de charge) réessaie plus tard ou ailleurs."""
+    response, status = _error(message, 503)
+    response.headers["Retry-After"] = str(RETRY_AFTER)
+    return response, status
+
+
+@app.get("/jobs/<job_id>")
+def job_status(job_id):
+    job, error = _job_or_404(job_id)
+    if error:
+        return error
+    body = {
+        "job_id": job.id,
+        "status": job.status,
+        "events": [message for _, message in job.snapshot_events()],
+    }
+    if job.status == "en_attente":
+        body["queue_position"] = jobs.manager.position(job)
+    if job.status == "erreur":
+        body["error"] = str(job.error)
+    if job.status == "terminé":
+        body["timings"] = job.result["timings"]
+        body["memo"] = job.result["memo"]
+        body["precheck"] = job.result["precheck"]
+        body["downloads"] = [f"/jobs/{job.id}/letter.{fmt}" for fmt in ("md", "docx", "pdf")]
+    return jsonify(body)
+
+
+@app.get("/jobs/<job_id>/letter.<fmt>")
+def download_letter(job_id, fmt):
+    job, error = _job_or_404(job_id)
+    if error:
+        return error
+    if job.status != "terminé":
+        return _error(f"Job pas encore terminé (statut : {job.status})", 409)
+    if fmt == "md":
+        return send_file(io.BytesIO(job.result["final_text"].encode("utf-8")), mimetype="text/markdown",
+                         as_attachment=True, download_name="lettre_motivation.md")
+    if fmt == "docx":
+        return send_file(io.BytesIO(job.result["docx"]),
+                         mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                         as_attachment=True, download_name="lettre_motivation.docx")
+    if fmt == "pdf":
+        return send_file(io.BytesIO(_letter_pdf(job.result)), mimetype="application/pdf",
+                         as_attachment=True, download_name="lettre_motivation.pdf")
+    return _error("Format inconnu (md, docx ou pdf)", 404)
+
+
+def _letter_pdf(result):
+    """PDF rendu au premier téléchargement puis gardé avec le résultat du job."""
+    if "pdf" not in result:
+        import export
+
+        result["pdf"] = export.create_pdf(result["final_text"], result["draft_text"], result["session_params"])
+    return result["pdf"]
@@ -1,7 +1,13 @@
 import os
+import time
+import uuid
 import streamlit as st
 from dotenv import load_dotenv
-from crewai import Crew
+import batch
+import jobs
+import pipeline
+import tracing
+import usage
 import utils
 
 # Charger les variables d'environnement
@@ -16,6 +22,15 @@ st.set_page_config(
 
 st.title("🎯 Générateur de lettres de motivation")
 
+# Préchargement des dépendances lourdes (crewai, pymupdf...) en arrière-plan, une fois
+# par process, pendant que l'utilisateur lit la page d'accueil (WARMUP=1)
+@st.cache_resource
+def warm_up_once():
+    return utils.warm_up()
+
+if os.getenv("WARMUP") == "1":
+    warm_up_once()
+
 # ==========================================
 # SIDEBAR (toujours visible et en premier)
 # ==========================================
@@ -111,21 +126,111 @@ if not st.session_state.openai_key or not st.session_state.serper_key:
 # CODE PRINCIPAL (exécuté uniquement si clés présentes)
 # ==========================================
 
-# Configuration des variables d'environnement pour CrewAI
-os.environ["OPENAI_API_KEY"] = st.session_state.openai_key
-os.environ["SERPER_API_KEY"] = st.session_state.serper_key
-os.environ['OPENAI_MODEL_NAME'] = "gpt-5-mini" #"gpt-5-nano"
+# Les clés restent propres à la session : passées explicitement aux LLM et aux outils
+# (params["credentials"]), jamais écrites dans os.environ partagé par toutes les sessions
+credentials = {
+    "openai_api_key": st.session_state.openai_key,
+    "serper_api_key": st.session_state.serper_key,
+}
+os.environ.setdefault('OPENAI_MODEL_NAME', utils.DEFAULT_MODEL) #"gpt-5-nano"
 
 # # Vérification des clés API
 def check_api_keys():
-    required_keys = ["OPENAI_API_KEY", "SERPER_API_KEY", "OPENAI_MODEL_NAME"]
-    missing = [key for key in required_keys if not os.getenv(key)]
+    required = {
+        "OPENAI_API_KEY": credentials["openai_api_key"],
+        "SERPER_API_KEY": credentials["serper_api_key"],
+        "OPENAI_MODEL_NAME": os.getenv("OPENAI_MODEL_NAME"),
+    }
+    missing = [key for key, value in required.items() if not value]
     if missing:
         st.error(f"Clés API manquantes: {', '.join(missing)}")
         st.info("Configurez-les dans les variables d'environnement Cloud Run")
         return False
     return True
 
+# Rafraîchissement (s) de la lettre affichée pendant qu'elle s'écrit
+STREAM_REFRESH = 0.25
+
+def follow_job(job, label):
+    """Affiche la progression d'un job d'arrière-plan jusqu'à sa fin.
+
+    Si le job a un flux (job.stream), la lettre s'affiche pendant sa
+    rédaction puis sa relecture. Un rerun interrompt seulement l'affichage :
+    le job continue et la page s'y rattache au passage suivant.
+    """
+    with st.status(label, expanded=True) as status:
+        progress_box = st.empty()
+        letter_box = st.empty()
+        while not job.done:
+            if job.status == "en_attente":
+                ahead = jobs.manager.position(job)
+                progress_box.markdown(
+                    f"⏳ En file d'attente : {ahead} génération(s) avant la tienne" if ahead else "⏳ Démarrage imminent..."
+                )
+            else:
+                progress_box.markdown("\n\n".join(message for _, message in job.snapshot_events()))
+            if job.stream is not None:
+                # Lettre en cours d'écriture, rafraîchie plus souvent que la progression
+                task_name, text = job.stream.snapshot()
+                if text:
+                    letter_box.markdown(f"**✍️ {pipeline.TASK_LABELS.get(task_name, task_name)} en direct**\n\n{text}")
+            time.sleep(STREAM_REFRESH if job.stream is not None else 1)
+        letter_box.empty()
+        progress_box.markdown("\n\n".join(message for _, message in job.snapshot_events()))
+        if job.status == "erreur":
+            status.update(label="Échec de la génération", state="error")
+        else:
+            status.update(label="Génération terminée", state="complete", expanded=False)
+
+BUSY_MESSAGE = "⏳ Le serveur génère déjà beaucoup de lettres et sa file d'attente est pleine : réessaie dans quelques minutes."
+
+def start_job(state_key, submit):
+    """Soumet un job et garde son identifiant en session ; file pleine : refus affiché tout de suite."""
+    try:
+        st.session_state[state_key] = submit().id
+    except jobs.QueueFullError:
+        st.error(BUSY_MESSAGE)
+        return False
+    return True
+
+def submit_generation(params, variants=None):
+    """Lance la génération (ou les variantes) en arrière-plan et renvoie le job."""
+    if variants:
+        return jobs.manager.submit(pipeline.run_variants, params, variants, weight=len(variants))
+    return jobs.manager.submit(pipeline.run_generation, params, stream=True)
+
+def show_variants(result):
+    """Variantes côte à côte, avec un Word commun."""
+    st.success(f"✅ {len(result['variants'])} variantes générées")
+    columns = st.columns(len(result["variants"]))
+    for number, (column, variant) in enumerate(zip(columns, result["variants"]), start=1):
+        with column:
+            st.subheader(variant["label"])
+            st.caption(
+                f"Créativité rédacteur {variant['temperatures']['writer_agent']} · "
+                f"{variant['usage']['total'].get('total_tokens', 0)} tokens"
+            )
+            st.markdown(variant["final_text"])
+            st.download_button(
+                label="📥 Markdown",
+                data=variant["final_text"],
+                file_name=f"lettre_variante_{number}.md",
+                mime="text/markdown",
+                key=f"variant_md_{number}",
+            )
+
+    st.download_button(
+        label="📄 Télécharger toutes les variantes (Word .docx)",
+        data=result["docx"],
+        file_name="lettres_variantes.docx",
+        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    )
+    timings = result["timings"]
+    st.caption(
+        f"⏱️ Analyses (une seule fois) : {timings['analyses']:.1f} s · total : {timings['total']:.1f} s · "
+        f"coût estimé : {usage.format_cost(result['usage'].get('cost'))}"
+    )
+
 st.sidebar.header("⚙️ Réglage des Agents")
 temperatures = {
     "research_agent": st.sidebar.slider(
@@ -149,6 +254,19 @@ temperatures = {
         help="Rigueur pour la relecture"
     )
 }
+st.sidebar.header("💰 Budget par génération")
+budget = {
+    "max_tokens": st.sidebar.number_input(
+        "Tokens maximum (0 = illimité)",
+        min_value=0, value=int(os.getenv("MAX_TOKENS_PER_RUN", "0")), step=10000,
+        help="La génération s'arrête dès que ce nombre de tokens est dépassé"
+    ),
+    "max_cost": st.sidebar.number_input(
+        "Coût maximum en $ (0 = illimité)",
+        min_value=0.0, value=float(os.getenv("MAX_COST_PER_RUN", "0")), step=0.01, format="%.2f",
+        help="Estimation à partir des prix publics du modèle"
+    ),
+}
 # Formulaire principal
 if check_api_keys():
     st.subheader("💡 Trucs et astuces")
@@ -222,6 +340,24 @@ if check_api_keys():
             value=True,
             help="Ajoute la version brute (avant relecture) à la fin du document. Utile pour récupérer des idées coupées."
         )
+        review_mode = st.radio(
+            "Relecture",
+            pipeline.REVIEW_MODES,
+            index=pipeline.REVIEW_MODES.index(pipeline.DEFAULT_REVIEW_MODE),
+            horizontal=True,
+            help="Ciblée : longueur, tirets, majuscules et accords sont vérifiés localement et les fautes trouvées sont confiées au relecteur. "
+                 "Rapide : si le brouillon passe ces contrôles, il est rendu tel quel sans relecture. Complète : relecture sans pré-contrôle."
+        )
+        regenerate = st.checkbox(
+            "Régénérer même si une lettre identique existe",
+            value=False,
+            help="Par défaut, un formulaire identique (même CV, entreprise, annonce et réglages) renvoie la lettre déjà générée, sans relancer les agents"
+        )
+        variant_count = st.number_input(
+            "Nombre de variantes à comparer",
+            min_value=1, max_value=pipeline.MAX_VARIANTS, value=1,
+            help="Les analyses (entreprise, poste, CV) sont faites une seule fois ; seules la rédaction et la relecture sont refaites, avec un ton et une créativité différents"
+        )
         submitted = st.form_submit_button("🚀 Générer la lettre de motivation", type="primary")
     
     if submitted:
@@ -231,125 +367,209 @@ if check_api_keys():
             st.error("❌ Les bots ont besoin du nom de la boîte")
         elif not job_description:
             st.error("❌ Donne le nom du job pour lequel tu postules ou l'annonce")
+        elif jobs.manager.full():
+            # Refus immédiat, avant la conversion du CV
+            st.error(BUSY_MESSAGE)
         else:
-            with st.spinner("Génération en cours... Cela peut prendre 2-3 minutes."):
-                try:
-                    # Étape 1: Conversion du CV
-                    st.info("📊 Conversion et analyse du CV...")
-                    cv_path = utils.convert_cv_to_md(cv_file)
-                    
-                    if not cv_path:
-                        st.error("Erreur lors de la conversion du CV")
-                        st.stop()
-                    
-                    # Étape 2: Chargement des agents avec températures dynamiques
-                    st.info("🤖 Configuration des agents IA...")
-
-                    candidate_profile = candidate_profile + ". Important utiliser les principes de ponctuation et d'orthographe en français : pas de tiret semi-quadratin, majuscules uniquement pour les nom propres et en début de phrase."
-
-                    context = {
-                        "candidate_profile": candidate_profile or "Candidat",
-                        "cv_path": cv_path,
-                        "company_url": company_url,
-                        "hiring_needs": job_description,
-                        "gender": gender_option
-                    }
-                    agents = utils.load_agents_from_yaml("agents.yaml", temperatures, context)
-
-                    # Étape 3: Chargement des tâches
-                    st.info("📝 Préparation des tâches...")
-                    tasks = utils.load_tasks_from_yaml("tasks.yaml", context)
-                    
-                    # Assigner les agents aux tâches
-                    task_agent_mapping = [
-                        ("research_agent", "company_culture_task"),
-                        ("research_agent", "role_requirements_task"),
-                        ("cv_extractor", "cv_analyzer_task"),
-                        ("writer_agent", "draft_letter_task"),
-                        ("review_agent", "review_letter_task")
-                    ]
-                    
-                    for agent_name, task_name in task_agent_mapping:
-                        task_idx = ["company_culture_task", "role_requirements_task", "cv_analyzer_task", "draft_letter_task", "review_letter_task"].index(task_name)
-                        tasks[task_idx].agent = agents[agent_name]
-                    
-                    # Définir les dépendances entre tâches
-                    tasks[3].context = [tasks[2]]  # draft_letter_task dépend de cv_analyzer_task
-                    tasks[4].context = [tasks[3]]  # review_letter_task dépend de draft_letter_task
-                    
-                    # Étape 4: Exécution du crew
-                    st.info("🎯 Génération de la lettre de motivation...")
-                    crew = Crew(
-                        agents=list(agents.values()),
-                        tasks=tasks,
-                        verbose=True
+            # Conversion et génération partagent un identifiant de suivi (celui du job)
+            with tracing.request():
+                # Étape 1: Conversion du CV
+                with st.spinner("📊 Conversion du CV..."):
+                    cv_md = utils.convert_cv_to_md(cv_file)
+
+                if not cv_md:
+                    st.error("Erreur lors de la conversion du CV")
+                    st.stop()
+
+                # Le CV reste propre à la session (pas de fichier partagé sur le disque)
+                st.session_state.cv_md = cv_md
+
+                # Étape 2: Lancement de la génération en arrière-plan
+                params = {
+                    "cv_md": cv_md,
+                    "company_url": company_url,
+                    "job_description": job_description,
+                    "candidate_profile": candidate_profile,
+                    "gender": gender_option,
+                    "temperatures": temperatures,
+                    "include_draft": include_draft,
+                    "budget": budget,
+                    "credentials": credentials,
+                    "regenerate": regenerate,
+                    "review_mode": review_mode,
+                    # Repris par le bouton « Reprendre » : seule cette tentative retrouve ses points de sauvegarde
+                    "attempt_id": uuid.uuid4().hex,
+                }
+                variants = pipeline.make_variants(variant_count, temperatures) if variant_count > 1 else None
+                st.session_state.last_submission = (params, variants)
+                start_job("job_id", lambda: submit_generation(params, variants))
+
+    # Un rerun ou une reconnexion se rattache au job de la session
+    job = jobs.manager.get(st.session_state.get("job_id"))
+    if job:
+        follow_job(job, "Génération en cours... Cela peut prendre 2-3 minutes.")
+
+        if job.status == "erreur":
+            st.error(f"❌ Une erreur s'est produite: {str(job.error)}")
+            st.exception(job.error)
+            # Les tâches déjà terminées sont sauvegardées : seule la suite est refaite
+            if st.session_state.get("last_submission") and st.button("🔁 Reprendre là où ça s'est arrêté"):
+                params, variants = st.session_state.last_submission
+                if start_job("job_id", lambda: submit_generation(dict(params, resume=True), variants)):
+                    st.rerun()
+        elif "variants" in job.result:
+            show_variants(job.result)
+        else:
+            result = job.result
+
+            # Étape 3: Affichage du résultat
+            st.success("✅ Lettre générée avec succès!")
+            import tools
+            saved_calls = sum(s["api_calls_saved"] for s in tools.search_cache_stats().values())
+            if saved_calls:
+                st.caption(f"♻️ {saved_calls} appels de recherche évités grâce au cache depuis le démarrage")
+
+            if result.get("memo"):
+                st.info("♻️ Formulaire identique à une génération récente : lettre réutilisée, sans nouvel appel aux agents. "
+                        "Coche « Régénérer même si une lettre identique existe » pour une nouvelle version.")
+
+            st.subheader("📄 Lettre de motivation générée")
+            st.markdown(result["final_text"])
+
+            # --- SECTION TÉLÉCHARGEMENT ---
+            col_dl_1, col_dl_2, col_coffee = st.columns(3)
+
+            with col_dl_1:
+                st.download_button(
+                    label="📥 Télécharger (Markdown)",
+                    data=result["final_text"],
+                    file_name="lettre_motivation.md",
+                    mime="text/markdown"
+                )
+
+            with col_dl_2:
+                st.download_button(
+                    label="📄 Télécharger (Word .docx)",
+                    data=result["docx"],
+                    file_name="lettre_motivation.docx",
+                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                )
+                # PDF optionnel : rendu à la première demande, gardé avec le résultat du job
+                if st.checkbox("📕 Version PDF"):
+                    if "pdf" not in result:
+                        import export
+                        result["pdf"] = export.create_pdf(result["final_text"], result["draft_text"], result["session_params"])
+                    st.download_button(
+                        label="📕 Télécharger (PDF)",
+                        data=result["pdf"],
+                        file_name="lettre_motivation.pdf",
+                        mime="application/pdf"
+                    )
+            with col_coffee:
+                st.markdown('Si vous trouvez cette app utile')
+                utils.show_buy_me_coffee()
+
+            # Optionnel: Afficher le brouillon
+            if result["draft_text"]:
+                with st.expander("👀 Voir le brouillon brut (Debug)"):
+                    st.markdown(result["draft_text"])
+
+            timings = result["timings"]
+            with st.expander("⏱️ Temps par étape"):
+                for task_name, seconds in timings.items():
+                    if task_name != "total":
+                        st.markdown(f"• {pipeline.TASK_LABELS.get(task_name, task_name)} : {seconds:.1f} s")
+                st.markdown(
+                    f"**Total : {timings['total']:.1f} s** "
+                    f"(chemin critique : {pipeline.critical_path(timings, result['stages']):.1f} s)"
+                )
+                if result.get("first_text") is not None:
+                    st.markdown(f"• Premier texte de la lettre affiché après {result['first_text']:.1f} s")
+                precheck = result.get("precheck")
+                if precheck:
+                    st.markdown(
+                        f"• Pré-contrôle du brouillon : {precheck['durée'] * 1000:.0f} ms, {len(precheck['anomalies'])} anomalies"
+                        + (" (relecture sautée)" if precheck["relecture_sautée"] else "")
                     )
-                    
-                    result = crew.kickoff()
-                    
-                    # Étape 5: Affichage du résultat
-                    st.success("✅ Lettre générée avec succès!")
-                    
-                    st.subheader("📄 Lettre de motivation générée")
-                    st.markdown(result)
-                    
-                    # --- SECTION TÉLÉCHARGEMENT ---
-                    col_dl_1, col_dl_2, col_coffee = st.columns(3)
-
-                    with col_dl_1:
-                        st.download_button(
-                            label="📥 Télécharger (Markdown)",
-                            data=str(result),
-                            file_name="lettre_motivation.md",
-                            mime="text/markdown"
-                        )
-
-                    with col_dl_2:
-                        final_text = str(result)
-
-                        # Récupération du texte brouillon (Task index 3 = draft_letter_task)
-                        draft_text = str(tasks[3].output) if include_draft else None
-                    with col_dl_2:
-                # 1. Préparer les paramètres à sauvegarder ; à voir si on se créerait pas une petite base dans bigquery (avec une note)
-                # On rassemble tout ce qui est pertinent
-                        session_params = {
-                        "Entreprise": company_url,
-                        "Genre Candidat": gender_option, # Assure-toi que cette variable est accessible ici
-                        "Profil Candidat": candidate_profile,
-                        "Température Recherche": temperatures["research_agent"],
-                        "Température Extracteur CV": temperatures["cv_extractor"],
-                        "Température Rédacteur": temperatures["writer_agent"],
-                        "Température Relecteur": temperatures["review_agent"],
-                        "Description du poste": job_description[:500] + "..." if len(job_description) > 500 else job_description # On tronque si c'est immense
+                    for finding in precheck["anomalies"]:
+                        st.caption(f"{finding['règle']} : « {finding['extrait']} » → {finding['correction']}")
+                st.caption(f"Identifiant de suivi (logs et traces) : {job.id}")
+
+            run_usage = result["usage"]
+            with st.expander(f"🪙 Tokens et coût ({run_usage['model']}) : {usage.format_cost(run_usage['total'].get('cost'))}"):
+                st.dataframe([
+                    {
+                        "Tâche": pipeline.TASK_LABELS.get(task_name, task_name),
+                        "Agent": task_usage["agent"],
+                        "Modèle": task_usage.get("model", run_usage["model"]),
+                        "Prompt": task_usage["prompt_tokens"],
+                        "Completion": task_usage["completion_tokens"],
+                        "Requêtes": task_usage["successful_requests"],
+                        "Coût estimé": usage.format_cost(task_usage["cost"]),
                     }
-
-                        # On génère le fichier Word à la volée
-                        docx_file = utils.create_docx(final_text, draft_text, session_params) 
-                        
-                        
-                        
-                        st.download_button(
-                            label="📄 Télécharger (Word .docx)",
-                            data=docx_file,
-                            file_name="lettre_motivation.docx",
-                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                        )
-                    with col_coffee:
-                        st.markdown('Si vous trouvez cette app utile')
-                        utils.show_buy_me_coffee()
-
-                    
-                    # Optionnel: Afficher le fichier généré
-                    if include_draft and draft_text:
-                        with st.expander("👀 Voir le brouillon brut (Debug)"):
-                            st.markdown(draft_text)
-                            # if os.path.exists("candidature.md"):
-                            #     with open("candidature.md", "r") as f:
-                            #         st.text_area("Version détaillée (debug)", f.read(), height=300)
-                
-                except Exception as e:
-                    st.error(f"❌ Une erreur s'est produite: {str(e)}")
-                    st.exception(e)
+                    for task_name, task_usage in run_usage["tasks"].items()
+                ], use_container_width=True)
+                prep = result["prep"]
+                st.caption(
+                    f"Entrées nettoyées avant envoi au modèle : CV {prep['cv']['avant']} → {prep['cv']['après']} tokens, "
+                    f"annonce {prep['annonce']['avant']} → {prep['annonce']['après']} tokens"
+                )
+
+    # ==========================================
+    # MODE LOT : un CV, plusieurs annonces
+    # ==========================================
+    st.markdown('---')
+    st.subheader("📦 Candidatures en lot")
+    with st.expander("Un seul CV, plusieurs annonces (fichier CSV ou JSONL)"):
+        st.markdown("""
+        Le fichier contient une ligne par annonce avec les colonnes **company** et **job_description**
+        (ou *entreprise* / *annonce*). Le CV est analysé une seule fois et la recherche sur chaque entreprise
+        est partagée entre ses annonces. Tu récupères un zip avec une lettre par annonce.
+        """)
+        with st.form("batch_form"):
+            batch_gender = st.radio("Genre", ["féminin", "masculin"], index=0, horizontal=True)
+            batch_profile = st.text_input("Information importante te concernant")
+            batch_cv_file = st.file_uploader("Ton CV", type=["pdf", "docx", "md"], key="batch_cv")
+            postings_file = st.file_uploader("Annonces", type=["csv", "jsonl"])
+            batch_workers = st.slider("Générations simultanées", 1, 5, 3)
+            batch_submitted = st.form_submit_button("🚀 Générer toutes les lettres")
+
+    if batch_submitted:
+        if not batch_cv_file or not postings_file:
+            st.error("❌ Il faut un CV et un fichier d'annonces")
+        else:
+            try:
+                postings = batch.read_postings(postings_file.getvalue(), postings_file.name)
+            except Exception as e:
+                st.error(f"❌ Fichier d'annonces illisible : {e}")
+                postings = None
+            with tracing.request():
+                with st.spinner("📊 Conversion du CV..."):
+                    batch_cv_md = utils.convert_cv_to_md(batch_cv_file)
+                if postings and batch_cv_md:
+                    start_job("batch_job_id", lambda: jobs.manager.submit(batch.run_batch, {
+                        "cv_md": batch_cv_md,
+                        "candidate_profile": batch_profile,
+                        "gender": batch_gender,
+                        "temperatures": temperatures,
+                        "include_draft": False,
+                        "credentials": credentials,
+                    }, postings, max_workers=batch_workers, weight=min(batch_workers, len(postings))))
+
+    batch_job = jobs.manager.get(st.session_state.get("batch_job_id"))
+    if batch_job:
+        follow_job(batch_job, "Génération du lot en cours...")
+        if batch_job.status == "erreur":
+            st.error(f"❌ Une erreur s'est produite: {str(batch_job.error)}")
+            st.exception(batch_job.error)
+        else:
+            st.dataframe(batch_job.result["rows"], use_container_width=True)
+            st.download_button(
+                label="📦 Télécharger toutes les lettres (zip)",
+                data=batch_job.result["zip"],
+                file_name="lettres_motivation.zip",
+                mime="application/zip"
+            )
 
 # Footer
 st.markdown("---")
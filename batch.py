@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pipeline
+import tracing
+from cache import normalize_company
+
+
+# Noms de colonnes acceptés dans les fichiers d'annonces (CSV ou JSONL)
+COMPANY_KEYS = ("company", "entreprise", "company_url")
+POSTING_KEYS = ("job_description", "posting", "annonce", "description")
+
+# L'analyse du CV est faite une seule fois pour tout le lot
+BATCH_HIRING_NEEDS = "plusieurs postes (candidatures en lot), analyse générale du profil"
+
+
+def _pick(row, keys):
+    for key in keys:
+        value = row.get(key)
+        if value and str(value).strip():
+            return str(value).strip()
+    return ""
+
+
+def read_postings(data, filename):
+    """Lit un fichier d'annonces (CSV ou JSONL) en liste de {company, job_description}.
+
+    Lève ValueError si le format n'est pas supporté, si le fichier ne
+    contient aucune annonce ou si une ligne n'a pas d'entreprise ou
+    d'annonce.
+    """
+    text = data.decode("utf-8-sig")
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".csv":
+        rows = list(csv.DictReader(io.StringIO(text)))
+    elif extension in (".jsonl", ".ndjson"):
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        raise ValueError(f"Format non supporté: {extension}")
+
+    postings = []
+    for number, row in enumerate(rows, start=1):
+        row = {str(key).strip().lower(): value for key, value in row.items()}
+        company = _pick(row, COMPANY_KEYS)
+        job_description = _pick(row, POSTING_KEYS)
+        if not company or not job_description:
+            raise ValueError(f"Ligne {number} : entreprise ou annonce manquante")
+        postings.append({"company": company, "job_description": job_description})
+    if not postings:
+        raise ValueError("aucune annonce")
+    return postings
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", normalize_company(text)).strip("-")[:40] or "entreprise"
+
+
+def run_batch(params, postings, progress=print, max_workers=3):
+    """Génère une lettre par annonce pour un même CV.
+
+    `params` contient cv_md, candidate_profile, gender, temperatures et
+    include_draft. Le CV est analysé une fois, la recherche entreprise une
+    fois par entreprise distincte, puis les lignes tournent sur un pool
+    borné à `max_workers`. Renvoie {"rows": [...], "zip": bytes} ; chaque
+    ligne indique son statut, sa durée et son éventuelle erreur.
+    """
+    batch_start = time.perf_counter()
+
+    # 1. Analyse du CV, une seule fois pour tout le lot
+    progress("📊 Analyse du CV (une seule fois pour tout le lot)...")
+    shared_params = dict(params, company_url=postings[0]["company"], job_description=BATCH_HIRING_NEEDS)
+    cv_analysis = pipeline.run_single_task(shared_params, "cv_analyzer_task", progress)
+
+    # 2. Recherche entreprise, une fois par entreprise distincte (cache partagé sinon)
+    companies = {}
+    for posting in postings:
+        companies.setdefault(normalize_company(posting["company"]), posting)
+
+    def research(posting):
+        return pipeline.run_research(
+            dict(params, company_url=posting["company"], job_description=posting["job_description"]), progress
+        )
+
+    progress(f"🏢 Recherche sur {len(companies)} entreprise(s)...")
+    reports = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {name: pool.submit(tracing.wrap(research), posting) for name, posting in companies.items()}
+        for name, future in futures.items():
+            try:
+                reports[name] = future.result()
+            except Exception as e:
+                progress(f"⚠️ Recherche impossible pour {companies[name]['company']} : {e}")
+
+    # 3. Une génération par ligne, sur un pool borné
+    def generate(number, posting):
+        row_params = dict(params, company_url=posting["company"], job_description=posting["job_description"])
+        known_outputs = {"cv_analyzer_task": cv_analysis}
+        report = reports.get(normalize_company(posting["company"]))
+        if report is not None:
+            known_outputs["company_culture_task"] = report
+
+        start = time.perf_counter()
+        row = {"ligne": number, "entreprise": posting["company"]}
+        try:
+            result = pipeline.run_generation(row_params, progress=lambda message: None, known_outputs=known_outputs)
+            row.update(statut="ok", erreur="", result=result)
+            progress(f"✅ Ligne {number} ({posting['company']}) terminée")
+        except Exception as e:
+            row.update(statut="erreur", erreur=str(e), result=None)
+            progress(f"❌ Ligne {number} ({posting['company']}) : {e}")
+        row["durée (s)"] = round(time.perf_counter() - start, 1)
+        return row
+
+    progress(f"✍️ Rédaction de {len(postings)} lettre(s)...")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        rows = list(pool.map(tracing.wrap(lambda item: generate(*item)), enumerate(postings, start=1)))
+
+    # 4. Archive zip : une lettre .md et .docx par ligne réussie + rapport CSV
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        for row in rows:
+            if row["result"] is None:
+                continue
+            base = f"{row['ligne']:02d}_{_slug(row['entreprise'])}"
+            zf.writestr(f"{base}.md", row["result"]["final_text"])
+            zf.writestr(f"{base}.docx", row["result"]["docx"])
+
+        report = io.StringIO()
+        writer = csv.DictWriter(report, fieldnames=["ligne", "entreprise", "statut", "durée (s)", "erreur"], extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+        zf.writestr("rapport.csv", report.getvalue())
+
+    progress(f"📦 Lot terminé en {time.perf_counter() - batch_start:.0f} s")
+    return {
+        "rows": [{key: value for key, value in row.items() if key != "result"} for row in rows],
+        "zip": archive.getvalue(),
+    }
@@ -0,0 +1,100 @@
+"""Latence et coût d'une génération selon la répartition des agents entre modèle hébergé et serveur local.
+
+Deux serveurs factices (bench/fake_servers.py) jouent l'API OpenAI hébergée
+et un serveur local compatible OpenAI (Ollama, llama.cpp), chacun avec sa
+latence par appel. Chaque configuration surcharge la clé `llm:` des agents
+(params["agent_llms"]) ; les appels locaux sont comptés sans coût. Affiche
+p50/p95 de la durée totale, le coût estimé et les appels reçus par serveur.
+
+    python bench/bench_backends.py --iterations 3 --hosted-latency 0.8 --local-latency 0.3
+"""
+import argparse
+import contextlib
+import io
+import os
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+os.chdir(ROOT)
+
+import fake_servers  # noqa: E402
+from bench_pipeline import JOB_DESCRIPTION, percentile  # noqa: E402
+
+CV = "# Camille Martin\n\nData Scientist, 4 ans d'expérience en Python, SQL et prévision."
+
+
+def configurations(local_url, local_model):
+    local = {"provider": "local", "model": local_model, "base_url": f"{local_url}/v1"}
+    return {
+        "tout hébergé": {},
+        "extracteur + relecteur locaux": {"cv_extractor": local, "review_agent": local},
+        "tout local sauf rédacteur": {"research_agent": local, "cv_extractor": local, "review_agent": local},
+        "tout local": {name: local for name in ("research_agent", "cv_extractor", "writer_agent", "review_agent")},
+    }
+
+
+def run_once(pipeline, agent_llms):
+    """(durée totale en s, coût estimé) d'une génération."""
+    params = {
+        "cv_md": CV,
+        "company_url": "exemple.com",
+        "job_description": JOB_DESCRIPTION,
+        "candidate_profile": "Candidate de test",
+        "gender": "féminin",
+        "temperatures": pipeline.DEFAULT_TEMPERATURES,
+        "include_draft": True,
+        # Mêmes paramètres à chaque itération : sans cela, le memo des générations répond
+        "regenerate": True,
+        "agent_llms": agent_llms,
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = pipeline.run_generation(params, progress=lambda message: None)
+    return result["timings"]["total"], result["usage"]["total"]["cost"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=3, help="Générations par configuration")
+    parser.add_argument("--hosted-latency", type=float, default=0.8, help="Latence d'un appel au modèle hébergé (s)")
+    parser.add_argument("--local-latency", type=float, default=0.3, help="Latence d'un appel au serveur local (s)")
+    parser.add_argument("--local-model", default="qwen2.5:7b-instruct")
+    parser.add_argument("--words", type=int, default=250, help="Longueur des réponses des LLM factices (mots)")
+    args = parser.parse_args()
+
+    hosted, hosted_url, hosted_state = fake_servers.start(latency=args.hosted_latency, words=args.words)
+    local, local_url, local_state = fake_servers.start(latency=args.local_latency, words=args.words)
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-bench",
+        "SERPER_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{hosted_url}/v1",
+        "SERPER_BASE_URL": hosted_url,
+        "RESEARCH_CACHE_BACKEND": "none",
+        "CHECKPOINT_BACKEND": "none",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+    })
+
+    import pipeline
+    import usage
+
+    run_once(pipeline, {})  # imports paresseux hors mesure
+    print(f"{args.iterations} générations par configuration, latence hébergé {args.hosted_latency * 1000:.0f} ms, "
+          f"local {args.local_latency * 1000:.0f} ms")
+    print(f"{'configuration':<32}{'p50 (s)':>9}{'p95 (s)':>9}{'coût moyen':>12}{'appels hébergé/local':>23}")
+    for label, agent_llms in configurations(local_url, args.local_model).items():
+        hosted_before, local_before = hosted_state.snapshot()["chat"], local_state.snapshot()["chat"]
+        durations, costs = zip(*(run_once(pipeline, agent_llms) for _ in range(args.iterations)))
+        cost = usage.sum_costs(costs)
+        calls = (f"{(hosted_state.snapshot()['chat'] - hosted_before) / args.iterations:.0f} / "
+                 f"{(local_state.snapshot()['chat'] - local_before) / args.iterations:.0f}")
+        print(f"{label:<32}{percentile(durations, 50):9.2f}{percentile(durations, 95):9.2f}"
+              f"{usage.format_cost(None if cost is None else cost / len(costs)):>12}{calls:>23}")
+    hosted.shutdown()
+    local.shutdown()
+
+
+if __name__ == "__main__":
+    main()
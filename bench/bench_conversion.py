@@ -0,0 +1,129 @@
+"""Conversion des CV dans le thread appelant vs dans le pool de processus bridé.
+
+Pour chaque document (corpus petit/moyen/grand en PDF et DOCX, puis documents
+pathologiques : 60 pages, page saturée de tracés, DOCX tronqué), compare :
+
+- « en ligne » : pymupdf4llm.to_markdown sur tout le document, dans le
+  process (ce que faisait l'application avant le pool) ;
+- « pool » : conversion.convert (pages, temps et mémoire limités).
+
+Affiche la durée, le mode obtenu, les pages converties et le débit d'un
+thread voisin qui exécute du Python pendant la conversion, en % de son débit
+à vide : la part du GIL qui reste aux autres sessions Streamlit. Sur une
+machine à un seul cœur, le processus de conversion prend aussi ce cœur au
+voisin : le gain n'apparaît qu'à partir de deux cœurs.
+
+    python bench/bench_conversion.py --max-pages 10 --layout-timeout 3 --timeout 20
+"""
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+from corpus import build_corpus, build_pathological  # noqa: E402
+
+
+class Neighbour:
+    """Thread voisin qui exécute du Python en boucle : son débit mesure le GIL laissé aux autres sessions."""
+
+    def __init__(self):
+        self.units = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            sum(range(2000))
+            self.units += 1
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.rate = self.units / (time.perf_counter() - self._start)
+
+
+def inline(path):
+    import pymupdf
+    import pymupdf4llm
+
+    data = path.read_bytes()
+    if path.suffix == ".docx":
+        with pymupdf.open(stream=data, filetype="docx") as doc:
+            data = doc.convert_to_pdf()
+    with pymupdf.open("pdf", data) as doc:
+        pymupdf4llm.to_markdown(doc)
+        return "mise en page", f"{doc.page_count}/{doc.page_count}"
+
+
+def pooled(conversion, path):
+    _, info = conversion.convert(path.read_bytes(), path.suffix)
+    return info["mode"], f"{info['pages_converties']}/{info['pages']}"
+
+
+def idle_rate(seconds=0.5):
+    """Débit du thread voisin quand rien d'autre ne tourne."""
+    with Neighbour() as neighbour:
+        time.sleep(seconds)
+    return neighbour.rate
+
+
+def measure(fn, *args):
+    start = time.perf_counter()
+    with Neighbour() as neighbour:
+        try:
+            mode, pages = fn(*args)
+        except Exception as e:  # noqa: BLE001 - l'erreur fait partie du résultat
+            mode, pages = f"erreur ({type(e).__name__})", "-"
+    return time.perf_counter() - start, mode, pages, neighbour.rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-pages", type=int, default=10)
+    parser.add_argument("--layout-timeout", type=float, default=3, help="Au-delà : texte brut (s)")
+    parser.add_argument("--timeout", type=float, default=20, help="Au-delà : conversion abandonnée (s)")
+    parser.add_argument("--skip-inline", action="store_true", help="Ne mesurer que le pool (documents lents)")
+    args = parser.parse_args()
+
+    # Lus à l'import du module, et par les processus du pool (spawn) via l'environnement
+    os.environ.update({
+        "CV_MAX_PAGES": str(args.max_pages),
+        "CV_LAYOUT_TIMEOUT": str(args.layout_timeout),
+        "CV_CONVERSION_TIMEOUT": str(args.timeout),
+    })
+    import conversion
+
+    conversion.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        paths = [path for path in build_corpus(tmp / "corpus") if path.suffix != ".md"]
+        paths += build_pathological(tmp / "pathologiques")
+        pooled(conversion, paths[0])  # processus du pool démarrés et imports payés hors mesure
+        inline(paths[0])
+        baseline = idle_rate()
+
+        print(f"{os.cpu_count()} cœur(s), débit voisin en % du débit à vide")
+        print(f"{'document':<20}{'mode':<8}{'durée (s)':>10}{'débit voisin':>14}  {'pages':<7}résultat")
+        for path in paths:
+            modes = [("pool", pooled, (conversion, path))]
+            if not args.skip_inline:
+                modes.insert(0, ("ligne", inline, (path,)))
+            for label, fn, fn_args in modes:
+                elapsed, mode, pages, rate = measure(fn, *fn_args)
+                print(f"{path.name:<20}{label:<8}{elapsed:10.2f}{rate / baseline:13.0%}  {pages:<7}{mode}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Temps et mémoire de l'export d'une lettre longue avec brouillon (DOCX et PDF).
+
+La lettre mêle titres, gras, italique et listes ; le brouillon fait la même
+taille. Le premier export DOCX construit le modèle stylé (à froid), les
+suivants le recopient (à chaud). « docx (ancien) » est l'export d'avant le
+module export (Document() neuf, gras et italique retirés, une ligne = un
+paragraphe d'un seul run), pour comparer. La mémoire est le pic Python
+mesuré par tracemalloc pendant un export.
+
+    python bench/bench_export.py --paragraphs 40 --iterations 20
+"""
+import argparse
+import math
+import pathlib
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import export  # noqa: E402
+
+PARAGRAPH = (
+    "Votre entreprise place **l'innovation** et la *qualité* au cœur de sa culture, "
+    "et c'est précisément ce qui me donne envie de rejoindre vos équipes."
+)
+PARAMS = {"Entreprise": "exemple.com", "Genre Candidat": "féminin", "Modèle": "gpt-5-mini"}
+
+
+def baseline_docx(final_text, draft_text, params):
+    """Ancien utils.create_docx, recopié pour la comparaison."""
+    from io import BytesIO
+
+    from docx import Document
+    from docx.shared import Pt
+
+    def add_markdown(doc, text):
+        for line in text.split("\n"):
+            clean_text = line.strip()
+            if not clean_text:
+                continue
+            is_heading = clean_text.startswith("#")
+            if is_heading:
+                clean_text = clean_text.lstrip("#").strip()
+            paragraph = doc.add_paragraph(clean_text.replace("**", "").replace("__", ""))
+            if is_heading:
+                paragraph.runs[0].bold = True
+                paragraph.runs[0].font.size = Pt(12)
+                paragraph.paragraph_format.space_after = Pt(6)
+
+    doc = Document()
+    doc.styles["Normal"].font.name = "Calibri"
+    doc.styles["Normal"].font.size = Pt(11)
+    doc.add_heading("Lettre de Motivation (Version Finale)", 0)
+    doc.add_heading("Paramètres de la session", 0)
+    doc.add_paragraph("Voici les configurations utilisées pour générer cette lettre :")
+    table = doc.add_table(rows=1, cols=2)
+    table.style = "Table Grid"
+    table.rows[0].cells[0].text, table.rows[0].cells[1].text = "Paramètre", "Valeur"
+    for key, value in params.items():
+        cells = table.add_row().cells
+        cells[0].text, cells[1].text = str(key), str(value)
+    add_markdown(doc, final_text)
+    doc.add_page_break()
+    doc.add_heading("Premier Jet (Version non-relue)", 0)
+    doc.add_paragraph("Ceci est la version brute générée par le rédacteur avant le passage du relecteur.")
+    add_markdown(doc, draft_text)
+    bio = BytesIO()
+    doc.save(bio)
+    return bio
+
+
+def long_letter(paragraphs):
+    lines = ["# Objet : candidature au poste de **Data Scientist**", "", "Madame, Monsieur,", ""]
+    for number in range(paragraphs):
+        lines += [PARAGRAPH, ""]
+        if number % 5 == 4:
+            lines += ["- modèles de *prévision*", "- mise en **production**", "1. première étape", "2. seconde étape", ""]
+    lines.append("Je vous prie d'agréer, Madame, Monsieur, mes salutations distinguées.")
+    return "\n".join(lines)
+
+
+def measure(fn, iterations):
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return durations, peak
+
+
+def p95(values):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=40, help="Paragraphes de la lettre (et du brouillon)")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    letter = long_letter(args.paragraphs)
+    print(f"lettre + brouillon : {2 * len(letter.split())} mots")
+
+    start = time.perf_counter()
+    export.create_docx(letter, letter, PARAMS)
+    print(f"{'docx (à froid)':<16} {(time.perf_counter() - start) * 1000:8.1f} ms  (construction du modèle comprise)")
+
+    for label, fn in (
+        ("docx (ancien)", lambda: baseline_docx(letter, letter, PARAMS)),
+        ("docx", lambda: export.create_docx(letter, letter, PARAMS)),
+        ("docx sans params", lambda: export.create_docx(letter, letter)),
+        ("pdf", lambda: export.create_pdf(letter, letter, PARAMS)),
+    ):
+        durations, peak = measure(fn, args.iterations)
+        print(f"{label:<16} médiane {statistics.median(durations) * 1000:8.1f} ms   "
+              f"p95 {p95(durations) * 1000:8.1f} ms   pic mémoire {peak / 1024 / 1024:6.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
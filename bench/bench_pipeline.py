@@ -0,0 +1,178 @@
+"""Surcoût propre du pipeline, mesuré hors ligne contre des serveurs OpenAI et Serper factices.
+
+Pour chaque CV du corpus (MD/DOCX/PDF, petit/moyen/grand) et chaque
+itération : conversion du CV, nettoyage des entrées, chargement YAML et
+construction des agents/tâches, exécution du crew, export Word. Affiche
+p50/p95 par phase, les appels reçus par les serveurs factices et le pic de
+mémoire (RSS) du process. Par défaut les caches (CV, recherche) sont vidés à
+chaque itération pour mesurer le chemin complet ; `--warm` les conserve.
+
+    python bench/bench_pipeline.py --iterations 5 --latency 0.2
+    python bench/bench_pipeline.py --corpus mes_cv/ --latency 0
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import pathlib
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+os.chdir(ROOT)
+
+import fake_servers  # noqa: E402
+from corpus import build_corpus  # noqa: E402
+
+PHASES = ("conversion", "préparation", "configuration", "crew", "docx", "total")
+
+JOB_DESCRIPTION = """Data Scientist H/F
+
+Missions :
+- Construire des modèles de prévision
+- Déployer les modèles en production
+
+Profil recherché :
+Python, SQL, 3 ans d'expérience
+
+Nos avantages :
+- Télétravail, mutuelle, tickets restaurant
+"""
+
+
+class Upload:
+    """Imite le fichier uploadé de Streamlit attendu par convert_cv_to_md."""
+
+    def __init__(self, path):
+        self.name = path.name
+        self._data = path.read_bytes()
+
+    def getvalue(self):
+        return self._data
+
+
+def percentile(values, q):
+    """Percentile au rang le plus proche (q entre 0 et 100)."""
+    ordered = sorted(values)
+    index = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_once(path, pipeline, utils, usage, quiet):
+    """Une génération complète pour un CV ; renvoie la durée de chaque phase (s)."""
+    durations = {}
+
+    start = time.perf_counter()
+    cv_md = utils.convert_cv_to_md(Upload(path))
+    durations["conversion"] = time.perf_counter() - start
+
+    params = {
+        "cv_md": cv_md,
+        "company_url": "exemple.com",
+        "job_description": JOB_DESCRIPTION,
+        "candidate_profile": "Candidate de test",
+        "gender": "féminin",
+        "temperatures": pipeline.DEFAULT_TEMPERATURES,
+        "include_draft": True,
+    }
+    step = time.perf_counter()
+    params, _ = pipeline.prepare_params(params)
+    durations["préparation"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    tasks, stages = pipeline.build_tasks(params)
+    durations["configuration"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    tracker = usage.UsageTracker(utils.default_model())
+    output = io.StringIO() if quiet else sys.stdout
+    with contextlib.redirect_stdout(output):
+        pipeline.run_stages(stages, tasks, progress=lambda message: None, tracker=tracker)
+    durations["crew"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    final_text = tasks[stages[-1][-1]].output.raw
+    utils.create_docx(final_text, tasks["draft_letter_task"].output.raw, {"Entreprise": params["company_url"]})
+    durations["docx"] = time.perf_counter() - step
+
+    durations["total"] = time.perf_counter() - start
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5, help="Générations par CV")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence de chaque appel LLM factice (s)")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Latence de chaque recherche Serper factice (s)")
+    parser.add_argument("--words", type=int, default=250, help="Longueur des réponses du LLM factice (mots)")
+    parser.add_argument("--corpus", type=pathlib.Path, help="Dossier de CV existants (sinon corpus synthétique)")
+    parser.add_argument("--warm", action="store_true", help="Conserver les caches entre les itérations")
+    parser.add_argument("--verbose", action="store_true", help="Afficher la sortie des agents CrewAI")
+    args = parser.parse_args()
+
+    server, url, state = fake_servers.start(
+        latency=args.latency, words=args.words, search_latency=args.search_latency
+    )
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-bench",
+        "SERPER_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{url}/v1",
+        "SERPER_BASE_URL": url,
+        "RESEARCH_CACHE_BACKEND": "none",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+    })
+
+    import pipeline
+    import tools
+    import usage
+    import utils
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = sorted(p for p in args.corpus.iterdir() if p.suffix.lower() in (".md", ".pdf", ".docx")) \
+            if args.corpus else build_corpus(tmp)
+
+        run_once(paths[0], pipeline, utils, usage, not args.verbose)  # imports paresseux hors mesure
+        results = {phase: [] for phase in PHASES}
+        per_file = {}
+        for _ in range(args.iterations):
+            for path in paths:
+                if not args.warm:
+                    utils.cv_cache.clear()
+                    tools.serper_cache.clear()
+                durations = run_once(path, pipeline, utils, usage, not args.verbose)
+                for phase, seconds in durations.items():
+                    results[phase].append(seconds)
+                per_file.setdefault(path.name, []).append(durations["conversion"])
+    server.shutdown()
+
+    print(f"{len(paths)} CV x {args.iterations} itérations, latence LLM {args.latency * 1000:.0f} ms")
+    print(f"{'phase':<14}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    for phase in PHASES:
+        values = results[phase]
+        print(f"{phase:<14}{percentile(values, 50) * 1000:12.1f}{percentile(values, 95) * 1000:12.1f}")
+    print("\nconversion par fichier")
+    for name, values in per_file.items():
+        print(f"  {name:<20}{percentile(values, 50) * 1000:12.1f}{percentile(values, 95) * 1000:12.1f}")
+    counts = state.snapshot()
+    print(f"\nappels reçus : {counts['chat']} LLM, {counts['search']} Serper")
+    print(f"pic RSS : {peak_rss_mb():.0f} Mo")
+    if not counts["search"]:
+        # L'agent de recherche doit passer par CachedSerperDevTool et le Serper factice
+        print("aucune recherche Serper : le pipeline mesuré n'utilise pas l'outil de recherche")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Latence d'une génération avec et sans pré-contrôle local du brouillon.
+
+Compare les trois modes de relecture (pipeline.REVIEW_MODES) contre les
+serveurs factices (bench/fake_servers.py) : « complète » (relecture LLM
+sans pré-contrôle), « ciblée » (pré-contrôle puis relecture avec la liste
+de corrections) et « rapide » (relecture sautée si le brouillon passe).
+Avec `--words` au-dessus de 500, le brouillon factice est trop long et la
+relecture a toujours lieu. Affiche p50/p95 de la durée totale, la durée du
+pré-contrôle et le nombre d'appels LLM par génération.
+
+    python bench/bench_precheck.py --iterations 5 --latency 0.8 --words 250
+"""
+import argparse
+import contextlib
+import io
+import os
+import pathlib
+import statistics
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+os.chdir(ROOT)
+
+import fake_servers  # noqa: E402
+from bench_pipeline import JOB_DESCRIPTION, percentile  # noqa: E402
+
+CV = "# Camille Martin\n\nData Scientist, 4 ans d'expérience en Python, SQL et prévision."
+
+
+def run_once(pipeline, review_mode):
+    """(durée totale en s, durée du pré-contrôle en ms ou None) d'une génération."""
+    params = {
+        "cv_md": CV,
+        "company_url": "exemple.com",
+        "job_description": JOB_DESCRIPTION,
+        "candidate_profile": "Candidate de test",
+        "gender": "féminin",
+        "temperatures": pipeline.DEFAULT_TEMPERATURES,
+        "include_draft": True,
+        "review_mode": review_mode,
+        "regenerate": True,
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = pipeline.run_generation(params, progress=lambda message: None)
+    precheck = result["precheck"]
+    return result["timings"]["total"], precheck["durée"] * 1000 if precheck else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5, help="Générations par mode")
+    parser.add_argument("--latency", type=float, default=0.8, help="Latence de chaque appel LLM factice (s)")
+    parser.add_argument("--words", type=int, default=250, help="Longueur des réponses des LLM factices (mots)")
+    args = parser.parse_args()
+
+    server, url, state = fake_servers.start(latency=args.latency, words=args.words)
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-bench",
+        "SERPER_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{url}/v1",
+        "SERPER_BASE_URL": url,
+        "RESEARCH_CACHE_BACKEND": "none",
+        "CHECKPOINT_BACKEND": "none",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+    })
+
+    import pipeline
+
+    run_once(pipeline, "complète")  # imports paresseux hors mesure
+    print(f"{args.iterations} générations par mode, latence LLM {args.latency * 1000:.0f} ms, brouillon de ~{args.words} mots")
+    print(f"{'relecture':<12}{'p50 (s)':>9}{'p95 (s)':>9}{'pré-contrôle':>15}{'appels LLM':>12}")
+    for review_mode in ("complète", "ciblée", "rapide"):
+        calls_before = state.snapshot()["chat"]
+        durations, prechecks = zip(*(run_once(pipeline, review_mode) for _ in range(args.iterations)))
+        calls = (state.snapshot()["chat"] - calls_before) / args.iterations
+        precheck = "-" if prechecks[0] is None else f"{statistics.median(prechecks):.2f} ms"
+        print(f"{review_mode:<12}{percentile(durations, 50):9.2f}{percentile(durations, 95):9.2f}{precheck:>15}{calls:12.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
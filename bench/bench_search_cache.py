@@ -0,0 +1,86 @@
+"""Mémoïsation et dédoublonnage des recherches Serper (CachedSerperDevTool).
+
+Lance N recherches identiques en même temps (même requête à la casse et
+aux espaces près) contre le serveur Serper factice, puis une de plus une
+fois les premières terminées. Vérifie qu'une seule requête /search part
+vers le serveur et que le cache compte N-1 appels évités pendant la rafale
+(N au total). Code de sortie 1 sinon.
+
+    python bench/bench_search_cache.py --queries 16 --search-latency 0.3
+"""
+import argparse
+import os
+import pathlib
+import sys
+import threading
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+import fake_servers  # noqa: E402
+
+QUERIES = ("Netflix culture et valeurs", "  netflix   Culture et VALEURS ", "NETFLIX culture et valeurs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=16, help="Recherches identiques simultanées")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Latence du serveur Serper factice (s)")
+    args = parser.parse_args()
+
+    server, url, state = fake_servers.start(search_latency=args.search_latency)
+    os.environ.update({"SERPER_API_KEY": "serper-bench", "SERPER_BASE_URL": url})
+
+    import tools
+
+    tool = tools.CachedSerperDevTool()
+    barrier = threading.Barrier(args.queries)
+    results, errors = [], []
+
+    def search(number):
+        barrier.wait()
+        try:
+            results.append(tool._make_api_request(QUERIES[number % len(QUERIES)], "search"))
+        except Exception as e:  # noqa: BLE001 - rapportée en fin de mesure
+            errors.append(f"recherche {number} : {type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=search, args=(number,)) for number in range(args.queries)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    burst = dict(state.snapshot(), **tools.serper_cache.stats())
+
+    # Après la rafale : servie par le cache, sans requête
+    tool._make_api_request(QUERIES[0], "search")
+    after = dict(state.snapshot(), **tools.serper_cache.stats())
+    server.shutdown()
+
+    print(f"{args.queries} recherches simultanées en {elapsed:.2f} s (latence Serper {args.search_latency} s)")
+    print(f"rafale : {burst['search']} requête(s) /search, {burst['api_calls_saved']} appel(s) évité(s)")
+    print(f"après : {after['search']} requête(s) /search, {after['api_calls_saved']} appel(s) évité(s)")
+    problems = errors + [
+        f"{label} : {actual} au lieu de {expected}"
+        for label, actual, expected in (
+            ("requêtes /search pendant la rafale", burst["search"], 1),
+            ("appels évités pendant la rafale", burst["api_calls_saved"], args.queries - 1),
+            ("requêtes /search au total", after["search"], 1),
+            ("appels évités au total", after["api_calls_saved"], args.queries),
+            ("résultats différents", len({repr(result) for result in results}), 1),
+        )
+        if actual != expected
+    ]
+    if problems:
+        print(f"{len(problems)} anomalies :")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("une seule requête Serper pour toute la rafale")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Générations simultanées avec des clés API différentes dans un même process.
+
+Chaque session a ses propres clés (params["credentials"]) et un marqueur
+dans le nom de l'entreprise et l'annonce. Le serveur factice journalise la
+clé reçue avec chaque requête : toute requête LLM doit porter la clé de la
+session dont elle contient le marqueur, et aucune requête ne doit utiliser
+les clés de l'environnement du process (valeurs sentinelles ici). Affiche
+aussi le nombre de connexions TCP ouvertes pour le nombre de requêtes
+(connexions réutilisées par clé). Code de sortie 1 en cas de fuite.
+
+    python bench/bench_sessions.py --sessions 8 --latency 0.2
+"""
+import argparse
+import contextlib
+import io
+import os
+import pathlib
+import re
+import sys
+import threading
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+os.chdir(ROOT)
+
+import fake_servers  # noqa: E402
+
+ENV_OPENAI_KEY = "sk-env-process"
+ENV_SERPER_KEY = "serper-env-process"
+MARKER = re.compile(r"session-(\d{3})")
+
+
+def session_params(pipeline, number):
+    marker = f"session-{number:03d}"
+    return {
+        "cv_md": f"# Candidat {marker}\n\nData Scientist, Python et SQL.",
+        "company_url": f"entreprise-{marker}",
+        "job_description": f"Data Scientist (réf. {marker})\n\nMissions : modèles de prévision.",
+        "candidate_profile": "Candidat de test",
+        "gender": "féminin",
+        "temperatures": pipeline.DEFAULT_TEMPERATURES,
+        "include_draft": False,
+        "credentials": {"openai_api_key": f"sk-{marker}", "serper_api_key": f"serper-{marker}"},
+    }
+
+
+def check(requests, sessions):
+    """Liste des anomalies : clé d'environnement, clé inconnue ou clé d'une autre session."""
+    problems = []
+    for route, api_key, text in requests:
+        if api_key in (ENV_OPENAI_KEY, ENV_SERPER_KEY, ""):
+            problems.append(f"{route} : clé du process ou absente ({api_key!r})")
+            continue
+        owner = MARKER.search(api_key)
+        if owner is None or int(owner.group(1)) >= sessions:
+            problems.append(f"{route} : clé inconnue {api_key!r}")
+            continue
+        markers = set(MARKER.findall(text))
+        if route == "chat" and markers and markers != {owner.group(1)}:
+            problems.append(f"chat : clé de la session {owner.group(1)} pour le texte de {', '.join(sorted(markers))}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8, help="Générations simultanées (une clé chacune)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Latence de chaque appel LLM factice (s)")
+    parser.add_argument("--words", type=int, default=120)
+    args = parser.parse_args()
+
+    server, url, state = fake_servers.start(latency=args.latency, words=args.words, record=True)
+    os.environ.update({
+        "OPENAI_API_KEY": ENV_OPENAI_KEY,
+        "SERPER_API_KEY": ENV_SERPER_KEY,
+        "OPENAI_BASE_URL": f"{url}/v1",
+        "SERPER_BASE_URL": url,
+        "RESEARCH_CACHE_BACKEND": "none",
+        "CHECKPOINT_BACKEND": "none",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+    })
+
+    import pipeline
+
+    errors = []
+
+    def generate(number):
+        try:
+            pipeline.run_generation(session_params(pipeline, number), progress=lambda message: None)
+        except Exception as e:  # noqa: BLE001 - rapportée en fin de mesure
+            errors.append(f"session {number} : {type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=generate, args=(number,)) for number in range(args.sessions)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    counts = state.snapshot()
+    problems = errors + check(state.requests, args.sessions)
+    if not counts["search"]:
+        problems.append("aucune recherche Serper : l'outil de recherche n'a pas été appelé")
+    print(f"{args.sessions} générations simultanées en {elapsed:.1f} s")
+    print(f"requêtes : {counts['chat']} LLM, {counts['search']} Serper ; connexions TCP ouvertes : {counts['connections']}")
+    if problems:
+        print(f"{len(problems)} anomalies :")
+        for problem in problems[:20]:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("aucune requête avec la clé du process ou d'une autre session")
+
+
+if __name__ == "__main__":
+    main()
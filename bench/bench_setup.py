@@ -0,0 +1,64 @@
+"""Coût de préparation d'une génération : chargement YAML + construction des agents/tâches/outils.
+
+Compare le comportement « à froid » (caches vidés à chaque itération, ce que
+faisait chaque requête avant la mise en cache) et « à chaud » (configs
+parsées et outils mutualisés réutilisés).
+
+    python bench/bench_setup.py --iterations 20
+"""
+import argparse
+import os
+import pathlib
+import statistics
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("SERPER_API_KEY", "bench")
+
+import pipeline  # noqa: E402
+import utils  # noqa: E402
+
+CONTEXT = {
+    "candidate_profile": "Candidate de test",
+    "company_url": "netflix",
+    "hiring_needs": "Data scientist, Python, SQL",
+    "gender": "féminin",
+    "tone": "",
+}
+
+
+def setup_once():
+    agents = utils.load_agents_from_yaml("agents.yaml", pipeline.DEFAULT_TEMPERATURES, CONTEXT, cv_text="# CV")
+    utils.load_tasks_from_yaml("tasks.yaml", CONTEXT, agents=agents)
+
+
+def measure(iterations, cold):
+    durations = []
+    for _ in range(iterations):
+        if cold:
+            utils._yaml_cache.clear()
+            utils.tool_pool.clear()
+        start = time.perf_counter()
+        setup_once()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_once()  # imports et initialisations paresseuses de CrewAI hors mesure
+    for label, cold in (("à froid (avant)", True), ("à chaud (après)", False)):
+        durations = measure(args.iterations, cold)
+        print(f"{label:<18} moyenne {statistics.mean(durations) * 1000:8.1f} ms   "
+              f"médiane {statistics.median(durations) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Temps d'import au démarrage, mesuré avec `python -X importtime`.
+
+Chaque cible est importée dans un interpréteur neuf ; le script additionne le
+temps cumulé des modules de premier niveau. `--max-ms` fait échouer le
+script si le chemin de la page d'accueil dépasse le budget (régression).
+
+    python bench/bench_startup.py --max-ms 1500
+"""
+import argparse
+import pathlib
+import re
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# Ce qu'importe app.py avant st.stop() (page d'accueil), puis le chemin de génération
+TARGETS = {
+    "accueil": "import streamlit, dotenv, batch, jobs, pipeline, utils",
+    "génération": "import utils; utils.warm_up(background=False)",
+}
+
+LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_time_ms(statement):
+    """Temps cumulé (ms) des modules de premier niveau importés par `statement`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        # Un module de premier niveau n'est pas indenté sous un autre import
+        if match and len(match.group(3)) == 1:
+            total_us += int(match.group(2))
+    return total_us / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Mesures par cible (on garde la meilleure)")
+    parser.add_argument("--max-ms", type=float, help="Budget de la page d'accueil en ms")
+    args = parser.parse_args()
+
+    results = {}
+    for label, statement in TARGETS.items():
+        results[label] = min(import_time_ms(statement) for _ in range(args.runs))
+        print(f"{label:<16} {results[label]:8.1f} ms")
+
+    if args.max_ms is not None and results["accueil"] > args.max_ms:
+        print(f"Régression : page d'accueil {results['accueil']:.1f} ms > {args.max_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
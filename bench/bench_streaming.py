@@ -0,0 +1,87 @@
+"""Délai avant le premier texte de lettre affiché, avec et sans streaming.
+
+Sans streaming, la page n'affiche la lettre qu'à la fin de la génération ;
+avec, la rédaction apparaît dès le premier jeton qui suit « Final Answer: ».
+La génération tourne hors ligne contre les serveurs factices (bench/
+fake_servers.py), qui envoient un mot par chunk SSE toutes les
+`--chunk-delay` secondes. Affiche p50/p95 du premier texte visible et de la
+durée totale pour chaque mode.
+
+    python bench/bench_streaming.py --iterations 5 --latency 0.5 --chunk-delay 0.02
+"""
+import argparse
+import contextlib
+import io
+import os
+import pathlib
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+os.chdir(ROOT)
+
+import fake_servers  # noqa: E402
+from bench_pipeline import JOB_DESCRIPTION, percentile  # noqa: E402
+
+CV = "# Camille Martin\n\nData Scientist, 4 ans d'expérience en Python, SQL et prévision."
+
+
+def run_once(pipeline, streaming, stream):
+    """(premier texte visible, durée totale) en secondes pour une génération."""
+    params = {
+        "cv_md": CV,
+        "company_url": "exemple.com",
+        "job_description": JOB_DESCRIPTION,
+        "candidate_profile": "Candidate de test",
+        "gender": "féminin",
+        "temperatures": pipeline.DEFAULT_TEMPERATURES,
+        "include_draft": True,
+        # Mêmes paramètres à chaque itération : sans cela, le memo des générations répond
+        "regenerate": True,
+    }
+    live = streaming.LetterStream() if stream else None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), streaming.capture(live):
+        result = pipeline.run_generation(params, progress=lambda message: None)
+    total = time.perf_counter() - start
+    return (result["first_text"] if stream else total), total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.5, help="Latence avant la réponse du LLM factice (s)")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="Délai entre deux chunks SSE (s)")
+    parser.add_argument("--words", type=int, default=250, help="Longueur des réponses du LLM factice (mots)")
+    args = parser.parse_args()
+
+    server, url, _ = fake_servers.start(latency=args.latency, words=args.words, chunk_delay=args.chunk_delay)
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-bench",
+        "SERPER_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{url}/v1",
+        "SERPER_BASE_URL": url,
+        "RESEARCH_CACHE_BACKEND": "none",
+        "CHECKPOINT_BACKEND": "none",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+    })
+
+    import pipeline
+    import streaming
+
+    run_once(pipeline, streaming, stream=False)  # imports paresseux hors mesure
+    print(f"{args.iterations} générations par mode, latence LLM {args.latency * 1000:.0f} ms, "
+          f"{args.chunk_delay * 1000:.0f} ms par chunk")
+    print(f"{'mode':<16}{'1er texte p50':>15}{'p95':>9}{'total p50':>12}{'p95':>9}")
+    for label, stream in (("sans streaming", False), ("streaming", True)):
+        first, total = zip(*(run_once(pipeline, streaming, stream) for _ in range(args.iterations)))
+        print(f"{label:<16}{percentile(first, 50):14.2f}s{percentile(first, 95):8.2f}s"
+              f"{percentile(total, 50):11.2f}s{percentile(total, 95):8.2f}s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
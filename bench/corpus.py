@@ -0,0 +1,133 @@
+"""Corpus de CV synthétiques (MD, DOCX, PDF) de différentes tailles pour les benchmarks.
+
+Les fichiers sont générés à la volée (aucun binaire versionné) :
+`build_corpus(dossier)` écrit un CV par couple (taille, format),
+`build_pathological(dossier)` des documents qui mettent la conversion en
+difficulté (très long, page saturée de tracés, DOCX tronqué).
+"""
+import pathlib
+
+# Nombre d'expériences par taille de CV (~3 expériences par page)
+SIZES = {"petit": 3, "moyen": 9, "grand": 30}
+FORMATS = ("md", "docx", "pdf")
+
+EXPERIENCE = (
+    "Data scientist chez Entreprise {n} (20{year}-20{next_year})",
+    [
+        "Conception de modèles de prévision de la demande en Python (pandas, scikit-learn)",
+        "Mise en production sur GCP avec Docker et Cloud Run, suivi des performances",
+        "Animation d'ateliers avec les équipes métier et restitution des résultats",
+    ],
+)
+
+
+def cv_sections(size):
+    """Contenu du CV : liste de (titre, paragraphes ou puces)."""
+    sections = [
+        ("Camille Martin", ["Data scientist, 6 ans d'expérience, Paris", "camille.martin@example.com"]),
+        ("Compétences", ["Python, SQL, statistiques, machine learning, visualisation, anglais courant"]),
+    ]
+    title, bullets = EXPERIENCE
+    for n in range(1, SIZES[size] + 1):
+        year = 10 + n % 14
+        sections.append((title.format(n=n, year=year, next_year=year + 1), bullets))
+    sections.append(("Formation", ["Master en statistiques, Université de Lyon"]))
+    return sections
+
+
+def to_markdown(sections):
+    lines = []
+    for title, items in sections:
+        lines += [f"## {title}", ""] + [f"- {item}" for item in items] + [""]
+    return "\n".join(lines)
+
+
+def write_docx(sections, path):
+    from docx import Document
+
+    document = Document()
+    for title, items in sections:
+        document.add_heading(title, level=2)
+        for item in items:
+            document.add_paragraph(item, style="List Bullet")
+    document.save(path)
+
+
+def write_pdf(sections, path):
+    import pymupdf
+
+    story = pymupdf.Story(html="".join(
+        f"<h2>{title}</h2><ul>{''.join(f'<li>{item}</li>' for item in items)}</ul>"
+        for title, items in sections
+    ))
+    writer = pymupdf.DocumentWriter(str(path))
+    more = True
+    while more:
+        device = writer.begin_page(pymupdf.paper_rect("a4"))
+        more, _ = story.place(pymupdf.paper_rect("a4") + (50, 50, -50, -50))
+        story.draw(device)
+        writer.end_page()
+    writer.close()
+
+
+def build_corpus(directory):
+    """Écrit un CV par taille et par format dans `directory` ; renvoie les chemins."""
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for size in SIZES:
+        sections = cv_sections(size)
+        for extension in FORMATS:
+            path = directory / f"cv_{size}.{extension}"
+            if extension == "md":
+                path.write_text(to_markdown(sections), encoding="utf-8")
+            elif extension == "docx":
+                write_docx(sections, path)
+            else:
+                write_pdf(sections, path)
+            paths.append(path)
+    return paths
+
+
+def write_long_pdf(path, pages=60):
+    """PDF de `pages` pages de texte (dossier complet scanné puis OCRisé, par exemple)."""
+    import pymupdf
+
+    doc = pymupdf.open()
+    for number in range(pages):
+        page = doc.new_page()
+        for line in range(40):
+            page.insert_text((50, 60 + 18 * line), f"Page {number + 1}, ligne {line + 1} : projet Python, SQL et prévision",
+                             fontsize=10)
+    doc.save(path)
+
+
+def write_dense_pdf(path, shapes=300):
+    """Une page de `shapes` petits cadres et textes : l'analyse de mise en page explose."""
+    import pymupdf
+
+    doc = pymupdf.open()
+    page = doc.new_page()
+    for n in range(shapes):
+        x, y = 20 + (n * 7) % 540, 20 + (n * 13) % 780
+        page.draw_rect(pymupdf.Rect(x, y, x + 15, y + 4), color=(0, 0, 0), width=0.3)
+        page.insert_text((x, y), "ab", fontsize=3)
+    doc.save(path)
+
+
+def write_broken_docx(path):
+    """DOCX tronqué à la moitié (upload interrompu)."""
+    write_docx(cv_sections("petit"), path)
+    data = pathlib.Path(path).read_bytes()
+    pathlib.Path(path).write_bytes(data[: len(data) // 2])
+
+
+def build_pathological(directory):
+    """Écrit les documents pathologiques dans `directory` ; renvoie les chemins."""
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = [directory / "cv_60_pages.pdf", directory / "cv_traces.pdf", directory / "cv_tronque.docx"]
+    write_long_pdf(paths[0])
+    write_dense_pdf(paths[1])
+    write_broken_docx(paths[2])
+    return paths
@@ -0,0 +1,242 @@
+"""Serveurs factices pour mesurer le pipeline hors ligne : API OpenAI et Serper.
+
+Un seul serveur HTTP local répond à :
+
+* POST /v1/chat/completions : réponses préparées au format ReAct de CrewAI,
+  avec une latence configurable (et le streaming SSE si demandé) ;
+* POST /search (et /news, /images...) : résultats Serper fixes.
+
+L'agent qui dispose de l'outil Serper fait une recherche avant de répondre
+(tant qu'aucun résultat d'outil ne figure dans la conversation), ce qui fait
+passer chaque génération par l'outil (et son cache). Aucun
+autre outil n'est appelé : WebsiteSearchTool demanderait des embeddings.
+Avec `record=True`, chaque requête est journalisée avec la clé API reçue
+(state.requests) ; le nombre de connexions TCP ouvertes est toujours compté.
+
+    python bench/fake_servers.py --port 8090 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8090/v1 SERPER_BASE_URL=http://127.0.0.1:8090 streamlit run app.py
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SERPER_TOOL_NAME = "Search the internet with Serper"
+# Présent dans chaque résultat Serper factice : sa présence dans la conversation
+# signale que la recherche a déjà eu lieu
+SERPER_MARKER = "[résultat serper factice]"
+
+LETTER_PARAGRAPH = (
+    "Votre entreprise place l'innovation et la qualité au cœur de sa culture, "
+    "et c'est précisément ce qui me donne envie de rejoindre vos équipes. "
+    "Mon parcours m'a permis de développer des compétences solides en analyse de données, "
+    "en travail d'équipe et en communication avec des interlocuteurs variés."
+)
+
+
+def canned_answer(words):
+    """Texte de réponse d'environ `words` mots, en paragraphes."""
+    paragraph_words = len(LETTER_PARAGRAPH.split())
+    count = max(1, round(words / paragraph_words))
+    return "\n\n".join([LETTER_PARAGRAPH] * count)
+
+
+def _tokens(text):
+    return max(1, len(text) // 4)
+
+
+class FakeState:
+    """Réglages et compteurs partagés par les requêtes du serveur."""
+
+    def __init__(self, latency=0.0, words=250, search_latency=0.0, chunk_delay=0.01, record=False):
+        self.latency = latency
+        self.words = words
+        self.search_latency = search_latency
+        self.chunk_delay = chunk_delay
+        self.record = record
+        self.counts = {"chat": 0, "search": 0, "connections": 0}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def count(self, route):
+        with self._lock:
+            self.counts[route] += 1
+
+    def log(self, route, api_key, text):
+        """Journalise (route, clé API, texte de la requête) si `record`."""
+        if self.record:
+            with self._lock:
+                self.requests.append((route, api_key, text))
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def chat_reply(messages, words):
+    """Réponse ReAct : une recherche Serper d'abord si l'agent a l'outil, sinon la réponse finale."""
+    prompt = "\n".join(str(message.get("content") or "") for message in messages)
+    if SERPER_TOOL_NAME in prompt and not _searched(messages):
+        return (
+            "Thought: je dois chercher des informations sur l'entreprise\n"
+            f"Action: {SERPER_TOOL_NAME}\n"
+            'Action Input: {"search_query": "culture et valeurs de l\'entreprise"}'
+        )
+    return f"Thought: I now can give a great answer\nFinal Answer: {canned_answer(words)}"
+
+
+def _searched(messages):
+    """Vrai si un résultat d'outil figure déjà dans la conversation.
+
+    Le prompt système de CrewAI décrit le format « Observation: ... » : seul
+    un message qui n'est pas le prompt système compte, avec le marqueur des
+    résultats Serper ou une observation ajoutée par CrewAI après l'action.
+    """
+    for message in messages:
+        role = message.get("role")
+        content = str(message.get("content") or "")
+        if role == "system":
+            continue
+        if SERPER_MARKER in content or (role == "assistant" and "\nObservation:" in content):
+            return True
+    return False
+
+
+def serper_results(query):
+    return {
+        "searchParameters": {"q": query, "type": "search", "engine": "google"},
+        "organic": [
+            {
+                "title": f"Résultat {position} pour {query} {SERPER_MARKER}",
+                "link": f"https://example.com/{position}",
+                "snippet": "L'entreprise met en avant l'innovation, la diversité et l'impact de ses produits.",
+                "position": position,
+            }
+            for position in range(1, 6)
+        ],
+    }
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: FakeState = None
+
+    def setup(self):
+        super().setup()
+        self.state.count("connections")
+
+    def log_message(self, format, *args):  # noqa: A002 - signature imposée
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):  # noqa: N802 - nom imposé par http.server
+        payload = self._read_json()
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            self.state.count("chat")
+            self.state.log(
+                "chat",
+                self.headers.get("Authorization", "").removeprefix("Bearer "),
+                "\n".join(str(message.get("content") or "") for message in payload.get("messages", [])),
+            )
+            self._chat(payload)
+        elif self.path.strip("/") in ("search", "news", "images", "places", "scholar"):
+            self.state.count("search")
+            self.state.log("search", self.headers.get("X-API-KEY", ""), payload.get("q", ""))
+            time.sleep(self.state.search_latency)
+            self._send_json(serper_results(payload.get("q", "")))
+        else:
+            self._send_json({"error": {"message": f"route inconnue: {self.path}"}}, status=404)
+
+    def _chat(self, payload):
+        time.sleep(self.state.latency)
+        content = chat_reply(payload.get("messages", []), self.state.words)
+        prompt_tokens = _tokens(json.dumps(payload.get("messages", []), ensure_ascii=False))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": _tokens(content),
+            "total_tokens": prompt_tokens + _tokens(content),
+        }
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake"),
+        }
+        if not payload.get("stream"):
+            self._send_json({
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        # Streaming SSE : un mot par chunk, `chunk_delay` secondes entre deux chunks
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(delta, finish_reason=None, **extra):
+            chunk = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        send({"role": "assistant", "content": ""})
+        for word in content.split(" "):
+            send({"content": word + " "})
+            time.sleep(self.state.chunk_delay)
+        extra = {"usage": usage} if (payload.get("stream_options") or {}).get("include_usage") else {}
+        send({}, finish_reason="stop", **extra)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start(port=0, **settings):
+    """Démarre le serveur dans un thread ; renvoie (serveur, url de base, état)."""
+    state = FakeState(**settings)
+    handler = type("BoundFakeHandler", (FakeHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake-servers").start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.5, help="Latence de chaque appel LLM (s)")
+    parser.add_argument("--search-latency", type=float, default=0.2, help="Latence de chaque recherche Serper (s)")
+    parser.add_argument("--words", type=int, default=250, help="Longueur des réponses (mots)")
+    args = parser.parse_args()
+
+    server, url, _ = start(args.port, latency=args.latency, words=args.words, search_latency=args.search_latency)
+    print(f"OPENAI_BASE_URL={url}/v1")
+    print(f"SERPER_BASE_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
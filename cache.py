@@ -0,0 +1,417 @@
+import hashlib
+import os
+import pathlib
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+def content_hash(*parts):
+    """SHA-256 hexadécimal d'une suite de morceaux (bytes ou str)."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(part)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class LRUCache:
+    """Cache LRU borné, thread-safe, avec un second niveau optionnel sur disque.
+
+    Le niveau mémoire garde au plus `maxsize` entrées (les moins récemment
+    utilisées sont évincées). Si `disk_dir` est fourni, chaque valeur (str)
+    est aussi écrite dans un fichier nommé d'après sa clé, ce qui permet de
+    survivre à un redémarrage ou d'être partagé entre workers d'un même hôte.
+    Le disque garde au plus `disk_maxsize` fichiers : au-delà, les moins
+    récemment utilisés (date de modification, rafraîchie à la lecture)
+    sont supprimés.
+    """
+
+    def __init__(self, maxsize=64, disk_dir=None, disk_maxsize=1000):
+        self.maxsize = maxsize
+        self.disk_dir = pathlib.Path(disk_dir) if disk_dir else None
+        self.disk_maxsize = disk_maxsize
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key):
+        return self.disk_dir / f"{key}.md"
+
+    def _disk_files(self):
+        return list(self.disk_dir.glob("*.md"))
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                value = path.read_text(encoding="utf-8")
+                os.utime(path)
+            except FileNotFoundError:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._put_memory(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._put_memory(key, value)
+        if self.disk_dir:
+            # Écriture atomique pour ne jamais lire un fichier à moitié écrit
+            path = self._disk_path(key)
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp_path.write_text(value, encoding="utf-8")
+            os.replace(tmp_path, path)
+            self._prune_disk()
+
+    def _prune_disk(self):
+        files = self._disk_files()
+        if len(files) <= self.disk_maxsize:
+            return
+        dated = []
+        for path in files:
+            try:
+                dated.append((path.stat().st_mtime, path))
+            except FileNotFoundError:  # supprimé entre-temps par un autre worker
+                continue
+        dated.sort()
+        for _, path in dated[:len(dated) - self.disk_maxsize]:
+            path.unlink(missing_ok=True)
+
+    def _put_memory(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Vide la mémoire et les fichiers du niveau disque."""
+        with self._lock:
+            self._data.clear()
+        if self.disk_dir:
+            for path in self._disk_files():
+                path.unlink(missing_ok=True)
+
+    def stats(self):
+        disk_entries = len(self._disk_files()) if self.disk_dir else 0
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "disk_entries": disk_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+def normalize_company(name):
+    """Normalise un nom d'entreprise pour en faire une clé de cache stable.
+
+    "  Netflix, Inc. " et "netflix inc" donnent la même clé : minuscules,
+    accents retirés, ponctuation et espaces multiples écrasés.
+    """
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"^https?://", "", text.strip())
+    text = re.sub(r"^www\.", "", text)
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return " ".join(text.split())
+
+
+class ResearchCache:
+    """Interface d'un cache de rapports de recherche entreprise.
+
+    Les backends implémentent get/set/delete/stats ; `NullResearchCache`
+    désactive le cache sans changer le code appelant.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, keys):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class NullResearchCache(ResearchCache):
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, keys):
+        pass
+
+
+class SQLiteResearchCache(ResearchCache):
+    """Cache SQLite avec TTL et éviction par taille (les moins récemment lus partent en premier).
+
+    Aucun service externe : un fichier local suffit, partagé par toutes les
+    sessions (et tous les workers) de l'instance. `table` permet de ranger
+    d'autres données (points de sauvegarde des tâches) dans le même format.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=1000, table="research_cache"):
+        self.path = str(path)
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # Éviction : entrées expirées puis dépassement de taille
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl,)
+            )
+            conn.execute(
+                f"""DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+
+    def delete(self, keys):
+        with self._lock, self._connect() as conn:
+            conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key in keys])
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            entries = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+
+def make_research_cache():
+    """Construit le cache de recherche selon l'environnement.
+
+    RESEARCH_CACHE_BACKEND : "sqlite" (défaut) ou "none".
+    RESEARCH_CACHE_PATH, RESEARCH_CACHE_TTL_HOURS, RESEARCH_CACHE_MAX_ENTRIES.
+    """
+    backend = os.getenv("RESEARCH_CACHE_BACKEND", "sqlite").lower()
+    if backend == "none":
+        return NullResearchCache()
+    if backend == "sqlite":
+        return SQLiteResearchCache(
+            os.getenv(
+                "RESEARCH_CACHE_PATH",
+                os.path.join(tempfile.gettempdir(), "research_cache.sqlite3"),
+            ),
+            ttl=float(os.getenv("RESEARCH_CACHE_TTL_HOURS", "168")) * 3600,
+            max_entries=int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", "1000")),
+        )
+    raise ValueError(f"Backend de cache inconnu: {backend}")
+
+
+def make_checkpoint_store():
+    """Points de sauvegarde des sorties de tâches (reprise après échec).
+
+    CHECKPOINT_BACKEND : "sqlite" (défaut) ou "none".
+    CHECKPOINT_PATH, CHECKPOINT_TTL_HOURS, CHECKPOINT_MAX_ENTRIES.
+    """
+    backend = os.getenv("CHECKPOINT_BACKEND", "sqlite").lower()
+    if backend == "none":
+        return NullResearchCache()
+    if backend == "sqlite":
+        return SQLiteResearchCache(
+            os.getenv("CHECKPOINT_PATH", os.path.join(tempfile.gettempdir(), "task_checkpoints.sqlite3")),
+            ttl=float(os.getenv("CHECKPOINT_TTL_HOURS", "24")) * 3600,
+            max_entries=int(os.getenv("CHECKPOINT_MAX_ENTRIES", "5000")),
+            table="task_checkpoints",
+        )
+    raise ValueError(f"Backend de points de sauvegarde inconnu: {backend}")
+
+
+class SingleFlightCache:
+    """Mémoïsation avec TTL et dédoublonnage des appels en cours.
+
+    Si deux sessions demandent la même clé en même temps, un seul appel
+    part réellement : les autres attendent son résultat. Les compteurs
+    `calls` (appels réels) et `saved` (appels évités) servent au suivi
+    du quota des API externes.
+    """
+
+    def __init__(self, ttl=24 * 3600, maxsize=2048):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.saved = 0
+
+    def get_or_call(self, key, fn, refresh=False):
+        """Valeur en cache ou en cours de calcul pour `key`, sinon résultat de `fn()`.
+
+        `refresh` ignore la valeur en cache et l'appel en cours : `fn` est
+        rappelée et son résultat remplace l'entrée.
+        """
+        with self._lock:
+            entry = None if refresh else self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.saved += 1
+                return entry[1]
+            future = None if refresh else self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.saved += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = fn()
+        except BaseException as e:
+            # Les appels en attente reçoivent la même erreur, rien n'est mis en cache
+            future.set_exception(e)
+            with self._lock:
+                self._release(key, future)
+            raise
+
+        with self._lock:
+            self.calls += 1
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._release(key, future)
+        future.set_result(value)
+        return value
+
+    def _release(self, key, future):
+        # Un appel `refresh` lancé entre-temps a pu prendre la place : on ne retire que le sien
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    def __contains__(self, key):
+        """Vrai si `key` est en cache (non expirée) ou en cours de calcul."""
+        with self._lock:
+            entry = self._data.get(key)
+            return key in self._inflight or (entry is not None and entry[0] > time.monotonic())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "in_flight": len(self._inflight),
+                "api_calls": self.calls,
+                "api_calls_saved": self.saved,
+            }
+
+
+
+class ClientPool:
+    """Objets coûteux (outils, clients HTTP) réutilisés par clé, au plus `maxsize` (LRU).
+
+    La fabrique tourne hors du verrou ; si deux threads créent le même objet
+    en même temps, le premier enregistré est gardé. Un objet évincé n'est pas
+    fermé : une génération en cours peut encore s'en servir.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                return value
+
+        value = factory()
+        with self._lock:
+            value = self._data.setdefault(key, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
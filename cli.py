@@ -0,0 +1,157 @@
+"""Point d'entrée en ligne de commande (sans Streamlit).
+
+Exemples :
+    python cli.py generate --cv cv.pdf --company netflix --job-file annonce.txt --out lettre
+    python cli.py batch --cv cv.pdf --postings annonces.csv --out lettres.zip
+
+Les clés sont lues dans l'environnement (OPENAI_API_KEY, SERPER_API_KEY,
+OPENAI_MODEL_NAME) ou dans un fichier .env.
+"""
+import argparse
+import os
+import pathlib
+import sys
+
+from dotenv import load_dotenv
+
+# Modes de relecture (pipeline.REVIEW_MODES) sans charger le pipeline
+import lettercheck
+
+
+def _base_params(args):
+    import pipeline
+    import utils
+
+    cv_path = pathlib.Path(args.cv)
+    return {
+        "cv_md": utils.convert_cv_bytes(cv_path.read_bytes(), cv_path.name),
+        "candidate_profile": args.profile,
+        "gender": args.gender,
+        "temperatures": dict(pipeline.DEFAULT_TEMPERATURES),
+        "include_draft": args.include_draft,
+        "review_mode": args.review_mode,
+    }
+
+
+def cmd_generate(args):
+    import pipeline
+
+    job_description = args.job_description
+    if args.job_file:
+        job_description = pathlib.Path(args.job_file).read_text(encoding="utf-8")
+    if not job_description:
+        print("Il faut --job-description ou --job-file", file=sys.stderr)
+        return 2
+
+    params = _base_params(args)
+    if args.variants > 1:
+        return _generate_variants(args, dict(params, company_url=args.company, job_description=job_description))
+    result = pipeline.generate_letter(
+        params["cv_md"],
+        args.company,
+        job_description,
+        candidate_profile=params["candidate_profile"],
+        gender=params["gender"],
+        temperatures=params["temperatures"],
+        include_draft=params["include_draft"],
+        review_mode=params["review_mode"],
+        progress=print,
+    )
+
+    pathlib.Path(f"{args.out}.md").write_text(result["final_text"], encoding="utf-8")
+    pathlib.Path(f"{args.out}.docx").write_bytes(result["docx"])
+    written = [f"{args.out}.md", f"{args.out}.docx"]
+    if args.pdf:
+        import export
+
+        pdf = export.create_pdf(result["final_text"], result["draft_text"], result["session_params"])
+        pathlib.Path(f"{args.out}.pdf").write_bytes(pdf)
+        written.append(f"{args.out}.pdf")
+    for task_name, seconds in result["timings"].items():
+        print(f"{task_name:<25} {seconds:7.1f}s")
+    print(f"Lettre écrite : {', '.join(written)}")
+    return 0
+
+
+def _generate_variants(args, params):
+    import pipeline
+
+    result = pipeline.run_variants(params, pipeline.make_variants(args.variants, params["temperatures"]), progress=print)
+    written = []
+    for number, variant in enumerate(result["variants"], start=1):
+        path = f"{args.out}_variante_{number}.md"
+        pathlib.Path(path).write_text(variant["final_text"], encoding="utf-8")
+        written.append(path)
+    pathlib.Path(f"{args.out}.docx").write_bytes(result["docx"])
+    written.append(f"{args.out}.docx")
+    print(f"Analyses : {result['timings']['analyses']:.1f}s, total : {result['timings']['total']:.1f}s")
+    print(f"Lettres écrites : {', '.join(written)}")
+    return 0
+
+
+def cmd_batch(args):
+    import batch
+
+    postings_path = pathlib.Path(args.postings)
+    postings = batch.read_postings(postings_path.read_bytes(), postings_path.name)
+    result = batch.run_batch(_base_params(args), postings, progress=print, max_workers=args.workers)
+
+    pathlib.Path(args.out).write_bytes(result["zip"])
+    for row in result["rows"]:
+        print(f"{row['ligne']:>3}  {row['statut']:<7} {row['durée (s)']:>7.1f}s  {row['entreprise']}  {row['erreur']}")
+    print(f"Archive écrite : {args.out}")
+    return 0 if all(row["statut"] == "ok" for row in result["rows"]) else 1
+
+
+REVIEW_MODE_HELP = (
+    "Relecture : ciblée (pré-contrôle local transmis au relecteur, défaut), "
+    "rapide (sautée si le brouillon est conforme) ou complète"
+)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Générateur de lettres de motivation (CrewAI)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Une lettre pour une annonce")
+    generate_parser.add_argument("--cv", required=True, help="CV (pdf, docx ou md)")
+    generate_parser.add_argument("--company", required=True, help="Nom de l'entreprise")
+    generate_parser.add_argument("--job-description", help="Texte de l'annonce")
+    generate_parser.add_argument("--job-file", help="Fichier texte contenant l'annonce")
+    generate_parser.add_argument("--out", default="lettre_motivation", help="Préfixe des fichiers .md et .docx")
+    generate_parser.add_argument("--gender", default="féminin", choices=["féminin", "masculin"])
+    generate_parser.add_argument("--profile", default="", help="Informations sur le candidat que les agents ne peuvent pas deviner")
+    generate_parser.add_argument("--include-draft", action="store_true", help="Inclure le brouillon dans le fichier Word")
+    generate_parser.add_argument("--review-mode", choices=lettercheck.REVIEW_MODES, help=REVIEW_MODE_HELP)
+    generate_parser.add_argument("--pdf", action="store_true", help="Écrire aussi une version PDF")
+    generate_parser.add_argument("--variants", type=int, default=1, help="Nombre de variantes (analyses mutualisées, 5 au plus)")
+    generate_parser.set_defaults(func=cmd_generate)
+
+    batch_parser = subparsers.add_parser("batch", help="Une lettre par annonce d'un fichier CSV/JSONL")
+    batch_parser.add_argument("--cv", required=True, help="CV (pdf, docx ou md)")
+    batch_parser.add_argument("--postings", required=True, help="Annonces : CSV ou JSONL avec colonnes company, job_description")
+    batch_parser.add_argument("--out", default="lettres.zip", help="Archive zip de sortie")
+    batch_parser.add_argument("--workers", type=int, default=3, help="Générations simultanées")
+    batch_parser.add_argument("--gender", default="féminin", choices=["féminin", "masculin"])
+    batch_parser.add_argument("--profile", default="", help="Informations sur le candidat que les agents ne peuvent pas deviner")
+    batch_parser.add_argument("--include-draft", action="store_true", help="Inclure le brouillon dans les fichiers Word")
+    batch_parser.add_argument("--review-mode", choices=lettercheck.REVIEW_MODES, help=REVIEW_MODE_HELP)
+    batch_parser.set_defaults(func=cmd_batch)
+    return parser
+
+
+def main(argv=None):
+    load_dotenv()
+    args = build_parser().parse_args(argv)
+
+    import utils
+    os.environ.setdefault("OPENAI_MODEL_NAME", utils.DEFAULT_MODEL)
+    missing = [key for key in ("OPENAI_API_KEY", "SERPER_API_KEY") if not os.getenv(key)]
+    if missing:
+        print(f"Clés API manquantes: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Conversion des CV PDF/DOCX en markdown dans un pool de processus bridés.
+
+pymupdf4llm analyse la mise en page en Python pur : un PDF de 40 pages ou un
+DOCX malformé monopolise le GIL pendant de longues secondes et bloque les
+autres sessions du process. La conversion tourne donc dans des processus
+séparés, avec trois limites :
+
+- pages : seules les CV_MAX_PAGES premières pages sont converties ;
+- temps : au-delà de CV_LAYOUT_TIMEOUT s, l'analyse de mise en page est
+  abandonnée au profit d'une extraction du texte brut (rapide) ; au-delà de
+  CV_CONVERSION_TIMEOUT s, la conversion est abandonnée ;
+- mémoire : espace d'adressage de chaque processus plafonné à
+  CV_CONVERSION_MEMORY_MB Mo.
+
+CV_CONVERSION_WORKERS=0 convertit dans le process appelant : même limite de
+pages, repli sur le texte brut seulement dans le thread principal (CLI), ni
+abandon ni plafond mémoire.
+
+Ce module n'importe que la bibliothèque standard : c'est lui que les
+processus du pool importent pour exécuter la conversion.
+"""
+import multiprocessing
+import os
+import signal
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows : pas de limites de ressources
+    resource = None
+
+
+MAX_PAGES = int(os.getenv("CV_MAX_PAGES", "10"))
+LAYOUT_TIMEOUT = float(os.getenv("CV_LAYOUT_TIMEOUT", "10"))
+CONVERSION_TIMEOUT = float(os.getenv("CV_CONVERSION_TIMEOUT", "30"))
+MEMORY_MB = int(os.getenv("CV_CONVERSION_MEMORY_MB", "2048"))
+WORKERS = int(os.getenv("CV_CONVERSION_WORKERS", "2"))
+# Processus recyclés après ce nombre de conversions (fragmentation mémoire de MuPDF)
+TASKS_PER_WORKER = 50
+
+# Modes de conversion renvoyés dans les informations
+LAYOUT, TEXT = "mise en page", "texte brut"
+
+
+class ConversionError(ValueError):
+    """CV impossible à convertir dans les limites (fichier illisible, trop lourd ou trop lent)."""
+
+
+class _LayoutTimeout(BaseException):
+    """BaseException : pymupdf4llm intercepte les Exception de ses étapes (find_tables...)."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def convert(data, file_extension, max_pages=None):
+    """Convertit un CV PDF/DOCX en markdown ; renvoie (markdown, informations).
+
+    Les informations indiquent le nombre de pages du document, le nombre de
+    pages converties et le mode (LAYOUT ou TEXT). Lève ConversionError si le
+    fichier est illisible ou dépasse CONVERSION_TIMEOUT.
+    """
+    max_pages = MAX_PAGES if max_pages is None else max_pages
+    pool = _get_pool()
+    if pool is None:
+        return _convert(data, file_extension, max_pages, LAYOUT_TIMEOUT)
+    pending = pool.apply_async(_convert, (data, file_extension, max_pages, LAYOUT_TIMEOUT))
+    try:
+        return pending.get(timeout=CONVERSION_TIMEOUT)
+    except multiprocessing.TimeoutError:
+        # Le processus bloqué est tué par sa limite de temps CPU (_limit_cpu)
+        # et remplacé par le pool ; les autres conversions continuent
+        raise ConversionError(
+            f"Conversion du CV interrompue après {CONVERSION_TIMEOUT:.0f} s : document trop lourd"
+        ) from None
+
+
+def start():
+    """Démarre le pool à l'avance (warm-up) : le premier CV ne paie pas le lancement des processus."""
+    _get_pool()
+
+
+def _get_pool():
+    global _pool
+    # Un processus du pool (ou un process sans pool configuré) convertit sur place
+    if WORKERS <= 0 or multiprocessing.parent_process() is not None:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn : pas de fork d'un process multi-thread (Streamlit, gunicorn --threads)
+            context = multiprocessing.get_context("spawn")
+            _pool = context.Pool(WORKERS, initializer=_init_worker, maxtasksperchild=TASKS_PER_WORKER)
+        return _pool
+
+
+def _init_worker():
+    if resource is not None and MEMORY_MB > 0:
+        limit = MEMORY_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    # Imports payés une fois par processus, pas à chaque CV
+    import pymupdf  # noqa: F401
+    import pymupdf4llm  # noqa: F401
+
+
+def _limit_cpu(seconds):
+    """Tue le processus (SIGXCPU) s'il consomme encore `seconds` s de CPU, même bloqué dans MuPDF."""
+    if resource is None or multiprocessing.parent_process() is None:
+        return
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(used.ru_utime + used.ru_stime + seconds) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _convert(data, file_extension, max_pages, layout_timeout):
+    import pymupdf
+    import pymupdf4llm
+
+    if file_extension not in (".pdf", ".docx"):
+        raise ConversionError(f"Format non supporté: {file_extension}")
+    _limit_cpu(CONVERSION_TIMEOUT)
+    try:
+        if file_extension == ".pdf":
+            doc = pymupdf.open(stream=data, filetype="pdf")
+        else:
+            # DOCX -> PDF en mémoire, limité aux premières pages
+            with pymupdf.open(stream=data, filetype="docx") as source:
+                pages = source.page_count
+                pdf_bytes = source.convert_to_pdf(0, min(pages, max_pages) - 1)
+            doc = pymupdf.open("pdf", pdf_bytes)
+    except Exception as e:
+        # Les exceptions de MuPDF ne traversent pas toujours le pickle du pool
+        raise ConversionError(f"CV illisible ({type(e).__name__}: {e})") from None
+
+    with doc:
+        if file_extension == ".pdf":
+            pages = doc.page_count
+            if pages > max_pages:
+                doc.select(range(max_pages))
+        info = {"pages": pages, "pages_converties": doc.page_count}
+        try:
+            with _deadline(layout_timeout):
+                md_text = pymupdf4llm.to_markdown(doc)
+            info["mode"] = LAYOUT
+        except (_LayoutTimeout, MemoryError):
+            md_text = _plain_text(doc)
+            info["mode"] = TEXT
+    return md_text, info
+
+
+def _plain_text(doc):
+    try:
+        return "\n\n".join(page.get_text(sort=True).strip() for page in doc)
+    except MemoryError:
+        raise ConversionError(f"CV trop lourd : mémoire de conversion dépassée ({MEMORY_MB} Mo)") from None
+
+
+@contextmanager
+def _deadline(seconds):
+    """Lève _LayoutTimeout dans le bloc après `seconds` s (thread principal uniquement)."""
+    armed = (
+        seconds > 0 and hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+    )
+    if not armed:
+        yield
+        return
+
+    def expire(signum, frame):
+        raise _LayoutTimeout(f"analyse de mise en page > {seconds} s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
@@ -0,0 +1,304 @@
+import html
+import re
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+import tracing
+
+
+# Style de paragraphe des titres markdown, défini une fois dans le modèle
+HEADING_STYLE = "Titre Markdown"
+BLOCK_STYLES = {
+    "heading": HEADING_STYLE,
+    "paragraph": "Normal",
+    "bullet": "List Bullet",
+    "number": "List Number",
+}
+
+# Caractères de contrôle refusés par XML (un LLM en renvoie parfois)
+XML_INVALID = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+BULLET = re.compile(r"^[-*+]\s+(.*)$")
+NUMBERED = re.compile(r"^\d+[.)]\s+(.*)$")
+RULE = re.compile(r"^([-*_])(\s*\1){2,}$")
+
+# Caractères sans lesquels une ligne n'a aucune mise en forme en ligne
+INLINE_MARKUP = re.compile(r"[*_`\[]")
+LINK = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+CODE = re.compile(r"`([^`]+)`")
+# (?![*_]) : dans « ***mot*** », le gras se ferme sur les deux derniers astérisques
+STRONG = re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1(?![*_])")
+# (?<!\w) / (?!\w) : « 2*3*4 » ou « nom_de_variable » restent du texte
+EMPHASIS = re.compile(r"(?<!\w)\*(?=\S)(.+?)(?<=\S)\*(?!\w)|(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)")
+
+
+def _emphasis_runs(text, bold):
+    runs = []
+    position = 0
+    for match in EMPHASIS.finditer(text):
+        runs.append((text[position:match.start()], bold, False))
+        runs.append((match.group(1) or match.group(2), bold, True))
+        position = match.end()
+    runs.append((text[position:], bold, False))
+    return runs
+
+
+def parse_inline(text):
+    """Découpe une ligne en runs (texte, gras, italique) ; liens et code gardent leur texte.
+
+    Une ligne sans mise en forme donne un seul run, et deux runs voisins de
+    même mise en forme sont fusionnés : un run de moins par paragraphe Word.
+    """
+    if not INLINE_MARKUP.search(text):
+        return [(text, False, False)] if text else []
+    text = CODE.sub(r"\1", LINK.sub(r"\1", text))
+    runs = []
+    position = 0
+    for match in STRONG.finditer(text):
+        runs += _emphasis_runs(text[position:match.start()], bold=False)
+        runs += _emphasis_runs(match.group(2), bold=True)
+        position = match.end()
+    runs += _emphasis_runs(text[position:], bold=False)
+    merged = []
+    for run in runs:
+        if not run[0]:
+            continue
+        if merged and merged[-1][1:] == run[1:]:
+            merged[-1] = (merged[-1][0] + run[0], *run[1:])
+        else:
+            merged.append(run)
+    return merged
+
+
+def parse_markdown(text):
+    """Découpe le markdown en blocs (type, runs) en une seule passe sur les lignes.
+
+    Types : heading, paragraph, bullet, number. Chaque ligne non vide donne
+    un bloc (les lettres gardent ainsi leurs lignes d'adresse et de formule).
+    """
+    blocks = []
+    for line in (text or "").splitlines():
+        stripped = line.strip()
+        if not stripped or RULE.match(stripped):
+            continue
+        for kind, pattern in (("heading", HEADING), ("bullet", BULLET), ("number", NUMBERED)):
+            match = pattern.match(stripped)
+            if match:
+                blocks.append((kind, parse_inline(match.group(match.lastindex))))
+                break
+        else:
+            blocks.append(("paragraph", parse_inline(stripped)))
+    return blocks
+
+
+@lru_cache(maxsize=1)
+def _docx_template():
+    """Document vide avec les styles de la lettre, construit une fois par process."""
+    from docx import Document
+    from docx.enum.style import WD_STYLE_TYPE
+    from docx.shared import Pt
+
+    doc = Document()
+    normal = doc.styles["Normal"]
+    normal.font.name = "Calibri"
+    normal.font.size = Pt(11)
+
+    heading = doc.styles.add_style(HEADING_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+    heading.base_style = normal
+    heading.font.bold = True
+    heading.font.size = Pt(12)
+    heading.paragraph_format.space_after = Pt(6)
+
+    bio = BytesIO()
+    doc.save(bio)
+    return bio.getvalue()
+
+
+def new_document():
+    """Copie du modèle : chaque export part d'un document neuf, déjà stylé."""
+    from docx import Document
+
+    return Document(BytesIO(_docx_template()))
+
+
+def block_styles(doc):
+    """Identifiant de style par type de bloc, résolu une fois par document.
+
+    Résoudre le nom à chaque paragraphe (python-docx parcourt tous les
+    styles) dominait l'export. None pour le style par défaut ("Normal"),
+    qu'il est inutile d'écrire.
+    """
+    default = doc.styles.default(doc.styles["Normal"].type)
+    return {
+        kind: None if doc.styles[name] == default else doc.styles[name].style_id
+        for kind, name in BLOCK_STYLES.items()
+    }
+
+
+def _paragraph_xml(style_id, runs):
+    properties = f'<w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>' if style_id else ""
+    parts = [f"<w:p>{properties}"]
+    for run_text, bold, italic in runs:
+        parts.append("<w:r>")
+        if bold or italic:
+            parts.append(f"<w:rPr>{'<w:b/>' if bold else ''}{'<w:i/>' if italic else ''}</w:rPr>")
+        parts.append(f'<w:t xml:space="preserve">{escape(XML_INVALID.sub("", run_text))}</w:t></w:r>')
+    parts.append("</w:p>")
+    return "".join(parts)
+
+
+def add_markdown(doc, text, styles=None):
+    """Ajoute le markdown à la fin du corps de `doc`, un paragraphe par bloc.
+
+    Les paragraphes sont écrits en XML et analysés en une fois, puis
+    insérés avant les propriétés de section : add_paragraph/add_run de
+    python-docx coûtent plusieurs fois plus cher par run.
+    """
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+
+    styles = styles or block_styles(doc)
+    paragraphs = "".join(_paragraph_xml(styles[kind], runs) for kind, runs in parse_markdown(text))
+    if not paragraphs:
+        return
+    body = doc.element.body
+    section = body.sectPr
+    for paragraph in list(parse_xml(f'<w:body {nsdecls("w")}>{paragraphs}</w:body>')):
+        if section is not None:
+            section.addprevious(paragraph)
+        else:
+            body.append(paragraph)
+
+
+def create_docx(final_text, draft_text=None, params=None):
+    """Génère le DOCX avec la version finale et optionnellement le brouillon (BytesIO)."""
+    with tracing.span("docx.export", label="docx", chars=len(final_text) + len(draft_text or "")):
+        doc = new_document()
+
+        # 1. Ajouter la version FINALE
+        doc.add_heading('Lettre de Motivation (Version Finale)', 0)
+
+        if params:
+            _add_params_table(doc, params)
+
+        styles = block_styles(doc)
+        add_markdown(doc, final_text, styles)
+
+        # 2. Ajouter le BROUILLON (si demandé)
+        if draft_text:
+            doc.add_page_break()
+            doc.add_heading('Premier Jet (Version non-relue)', 0)
+            note = doc.add_paragraph()
+            note.add_run("Ceci est la version brute générée par le rédacteur avant le passage du relecteur.").italic = True
+            add_markdown(doc, draft_text, styles)
+
+        return _save(doc)
+
+
+def create_variants_docx(letters, params=None):
+    """Un seul DOCX pour plusieurs variantes : `letters` liste de (titre, lettre, brouillon ou None)."""
+    with tracing.span("docx.export", label="variants", count=len(letters)):
+        doc = new_document()
+        doc.add_heading('Lettres de Motivation (Variantes)', 0)
+        if params:
+            _add_params_table(doc, params)
+
+        styles = block_styles(doc)
+        for index, (title, final_text, draft_text) in enumerate(letters):
+            if index or params:
+                doc.add_page_break()
+            doc.add_heading(title, 1)
+            add_markdown(doc, final_text, styles)
+            if draft_text:
+                doc.add_heading('Premier Jet (Version non-relue)', 2)
+                add_markdown(doc, draft_text, styles)
+        return _save(doc)
+
+
+def _add_params_table(doc, params):
+    doc.add_heading('Paramètres de la session', 0)
+    doc.add_paragraph("Voici les configurations utilisées pour générer cette lettre :")
+
+    table = doc.add_table(rows=1, cols=2)
+    table.style = 'Table Grid'
+    hdr_cells = table.rows[0].cells
+    hdr_cells[0].text = 'Paramètre'
+    hdr_cells[1].text = 'Valeur'
+    for key, value in params.items():
+        row_cells = table.add_row().cells
+        row_cells[0].text = str(key)
+        row_cells[1].text = str(value)
+
+
+def _save(doc):
+    bio = BytesIO()
+    doc.save(bio)
+    bio.seek(0)
+    return bio
+
+
+def _html_runs(runs):
+    parts = []
+    for run_text, bold, italic in runs:
+        text = html.escape(run_text)
+        if italic:
+            text = f"<i>{text}</i>"
+        if bold:
+            text = f"<b>{text}</b>"
+        parts.append(text)
+    return "".join(parts)
+
+
+def markdown_to_html(text):
+    """Même découpage que le DOCX, rendu en HTML simple (listes regroupées)."""
+    parts = []
+    open_list = None
+    for kind, runs in parse_markdown(text):
+        list_tag = {"bullet": "ul", "number": "ol"}.get(kind)
+        if list_tag != open_list:
+            if open_list:
+                parts.append(f"</{open_list}>")
+            if list_tag:
+                parts.append(f"<{list_tag}>")
+            open_list = list_tag
+        content = _html_runs(runs)
+        if kind == "heading":
+            parts.append(f"<h3>{content}</h3>")
+        elif list_tag:
+            parts.append(f"<li>{content}</li>")
+        else:
+            parts.append(f"<p>{content}</p>")
+    if open_list:
+        parts.append(f"</{open_list}>")
+    return "".join(parts)
+
+
+PDF_CSS = "body { font-family: sans-serif; font-size: 11pt; } h1 { font-size: 16pt; } h3 { font-size: 12pt; }"
+
+
+def create_pdf(final_text, draft_text=None, params=None):
+    """Version PDF de la lettre (octets), mise en page par PyMuPDF à partir du même markdown."""
+    import pymupdf
+
+    with tracing.span("pdf.export", label="pdf", chars=len(final_text) + len(draft_text or "")):
+        body = ["<h1>Lettre de Motivation</h1>", markdown_to_html(final_text)]
+        if params:
+            body.append("<h1>Paramètres de la session</h1>")
+            body += [f"<p><b>{html.escape(str(key))}</b> : {html.escape(str(value))}</p>" for key, value in params.items()]
+        if draft_text:
+            body += ["<h1>Premier Jet (Version non-relue)</h1>", markdown_to_html(draft_text)]
+
+        story = pymupdf.Story(html="".join(body), user_css=PDF_CSS)
+        bio = BytesIO()
+        writer = pymupdf.DocumentWriter(bio)
+        page = pymupdf.paper_rect("a4")
+        more = True
+        while more:
+            device = writer.begin_page(page)
+            more, _ = story.place(page + (60, 60, -60, -60))
+            story.draw(device)
+            writer.end_page()
+        writer.close()
+        return bio.getvalue()
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streaming
+import tracing
+
+
+class QueueFullError(RuntimeError):
+    """Générations en cours et file d'attente pleines : la demande est refusée tout de suite."""
+
+
+class Job:
+    """Une génération lancée en arrière-plan.
+
+    Le thread de travail y ajoute des messages de progression ; le script
+    Streamlit les relit à chaque rerun via l'identifiant gardé en session.
+    Avec `stream`, le texte de la lettre en cours de rédaction y arrive
+    aussi jeton par jeton (job.stream, un streaming.LetterStream).
+    """
+
+    def __init__(self, stream=False, weight=1):
+        # Soumis depuis une requête déjà tracée : même identifiant (corrélation)
+        self.id = tracing.current_request_id() or uuid.uuid4().hex
+        self.status = "en_attente"
+        self.events = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stream = streaming.LetterStream() if stream else None
+        # Générations menées en parallèle par le job (lot, variantes)
+        self.weight = weight
+        self._lock = threading.Lock()
+
+    def progress(self, message):
+        with self._lock:
+            self.events.append((time.time(), message))
+
+    def snapshot_events(self):
+        with self._lock:
+            return list(self.events)
+
+    @property
+    def done(self):
+        return self.status in ("terminé", "erreur")
+
+
+class JobManager:
+    """Pool de workers qui exécute les générations hors du thread du script.
+
+    Instancié une fois par process (module importé) : un rerun ou une
+    reconnexion retrouve le job en cours à partir de son identifiant.
+    Les jobs terminés sont oubliés après `retention` secondes.
+
+    Contrôle d'admission : au plus `max_workers` générations tournent en
+    même temps, les suivantes attendent dans une file FIFO d'au plus
+    `max_queue` générations. Un job qui en mène plusieurs en parallèle (lot,
+    variantes) compte pour son `weight`. Au-delà, submit lève
+    QueueFullError sans rien lancer. Profondeur de file, générations en
+    cours, refus et temps d'attente sont exposés dans les métriques
+    (tracing.metrics_text) et journalisés à chaque changement
+    (tracing.log_metrics), pour les process sans /metrics (Streamlit).
+    """
+
+    def __init__(self, max_workers=4, max_queue=20, retention=3600):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retention = retention
+        # Un thread par job admis : c'est _run qui attend qu'assez de générations se libèrent
+        self._executor = ThreadPoolExecutor(max_workers=max_workers + max_queue, thread_name_prefix="generation")
+        self._jobs = {}
+        # Jobs admis pas encore démarrés, dans l'ordre d'arrivée
+        self._waiting = []
+        # Générations en cours (somme des poids des jobs démarrés)
+        self._running = 0
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._update_gauges()
+
+    def submit(self, fn, *args, stream=False, weight=1, **kwargs):
+        """Lance `fn(*args, progress=job.progress, **kwargs)` et renvoie le job.
+
+        `stream` : les LLM en streaming appelés par `fn` écrivent dans job.stream.
+        `weight` : nombre de générations que `fn` mène en parallèle (borné à
+        max_workers). Lève QueueFullError si la file d'attente est pleine.
+        """
+        job = Job(stream, weight=min(max(1, weight), self.max_workers))
+        with self._lock:
+            self._purge()
+            if self._load() + job.weight > self.max_workers + self.max_queue:
+                tracing.metrics.increment("generations_rejected", "Demandes refusées, file d'attente pleine")
+                tracing.log_metrics("queue.rejected", weight=job.weight, **self._queue_state())
+                raise QueueFullError(
+                    f"Trop de demandes en cours ({self._running} générations, {len(self._waiting)} en attente)"
+                )
+            self._jobs[job.id] = job
+            self._waiting.append(job)
+            self._update_gauges("queue.admitted")
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def full(self):
+        """Vrai si une nouvelle demande serait refusée (à tester avant un travail coûteux)."""
+        with self._lock:
+            return self._load() >= self.max_workers + self.max_queue
+
+    def _load(self):
+        return self._running + sum(job.weight for job in self._waiting)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job):
+        """Nombre de générations à démarrer avant celle-ci (0 : c'est la prochaine ou elle tourne)."""
+        with self._lock:
+            if job not in self._waiting:
+                return 0
+            return sum(waiting.weight for waiting in self._waiting[:self._waiting.index(job)])
+
+    def _queue_state(self):
+        return {
+            "queue_depth": sum(job.weight for job in self._waiting),
+            "generations_running": self._running,
+            "generations_capacity": self.max_workers,
+        }
+
+    def _update_gauges(self, event=None):
+        state = self._queue_state()
+        tracing.metrics.set_gauge("queue_depth", state["queue_depth"], "Générations en attente d'un worker")
+        tracing.metrics.set_gauge("generations_running", state["generations_running"], "Générations en cours")
+        tracing.metrics.set_gauge(
+            "generations_capacity", state["generations_capacity"], "Générations simultanées autorisées"
+        )
+        if event is not None:
+            tracing.log_metrics(event, **state)
+
+    def _run(self, job, fn, args, kwargs):
+        with self._slot_freed:
+            # FIFO : le premier job en attente démarre dès que son poids tient
+            while self._waiting[0] is not job or self._running + job.weight > self.max_workers:
+                self._slot_freed.wait()
+            self._waiting.remove(job)
+            self._running += job.weight
+            self._update_gauges("queue.started")
+            self._slot_freed.notify_all()
+        job.started_at = time.time()
+        tracing.metrics.observe("queue.wait", "generation", job.started_at - job.created_at)
+        job.status = "en_cours"
+        try:
+            # L'identifiant du job sert d'identifiant de corrélation à tous ses spans
+            with tracing.request(job.id), streaming.capture(job.stream):
+                job.result = fn(*args, progress=job.progress, **kwargs)
+            # finished_at avant le statut : un job `done` a toujours sa date de fin (_purge)
+            job.finished_at = time.time()
+            job.status = "terminé"
+        except Exception as e:
+            job.error = e
+            job.finished_at = time.time()
+            job.status = "erreur"
+        finally:
+            with self._slot_freed:
+                self._running -= job.weight
+                self._update_gauges("queue.finished")
+                self._slot_freed.notify_all()
+
+    def _purge(self):
+        limit = time.time() - self.retention
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished_at is not None and j.finished_at < limit]:
+            del self._jobs[job_id]
+
+
+manager = JobManager(
+    max_workers=int(os.getenv("GENERATION_WORKERS", "4")),
+    max_queue=int(os.getenv("GENERATION_QUEUE_SIZE", "20")),
+)
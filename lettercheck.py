@@ -0,0 +1,163 @@
+import re
+
+
+# Modes de relecture du pipeline : "ciblée" (défaut : pré-contrôle local du brouillon,
+# anomalies transmises au relecteur), "rapide" (relecture sautée si le brouillon passe
+# le pré-contrôle) ou "complète" (relecture sans pré-contrôle, comportement historique).
+# Définis ici, module sans dépendance, pour que la CLI les lise sans charger le pipeline.
+REVIEW_MODES = ("ciblée", "rapide", "complète")
+
+# Règles de forme vérifiées localement avant la relecture (voir PUNCTUATION_RULES
+# de pipeline.py et review_letter_task dans tasks.yaml)
+MAX_WORDS = 500
+BANNED_CHARACTERS = {
+    "–": ("tiret semi-quadratin", "remplacer par une virgule, des parenthèses ou deux phrases"),
+    "—": ("tiret cadratin", "remplacer par une virgule, des parenthèses ou deux phrases"),
+    "•": ("puce", "rédiger en phrases, sans liste à puces"),
+}
+BULLET_LINE = re.compile(r"^\s*[-*+]\s+\S", re.MULTILINE)
+
+# Début de phrase ou de paragraphe suivi d'une minuscule
+LOWERCASE_START = re.compile(r"(?:\A\s*|\n\s*\n\s*|[.!?…]\s+)([a-zàâäéèêëîïôöùûüç][\w'’-]*)")
+MONTHS_AND_DAYS = (
+    "Janvier|Février|Mars|Avril|Mai|Juin|Juillet|Août|Septembre|Octobre|Novembre|Décembre"
+    "|Lundi|Mardi|Mercredi|Jeudi|Vendredi|Samedi|Dimanche"
+)
+# Mois et jours seulement dans une date (« le 3 Mars », « en Juin », « ce Lundi ») :
+# ailleurs (« chez Mars »), ce sont des noms propres
+CAPITALIZED_COMMON = re.compile(
+    rf"(?:\b\d{{1,2}}(?:er)?\s+|\b(?i:en|début|fin|depuis|dès|le|ce|chaque)\s+|\bmi-)({MONTHS_AND_DAYS})\b"
+    r"|\b(?:en|l['’])\s?(Français|Anglais|Espagnol|Allemand|Italien|Portugais|Chinois|Japonais|Arabe|Russe)\b"
+    r"|(?<=, )(Je)\b"
+)
+
+# Formes (masculin, féminin) fréquentes dans une lettre à la première personne
+GENDERED_FORMS = (
+    ("ravi", "ravie"), ("convaincu", "convaincue"), ("motivé", "motivée"), ("passionné", "passionnée"),
+    ("diplômé", "diplômée"), ("certain", "certaine"), ("persuadé", "persuadée"), ("prêt", "prête"),
+    ("heureux", "heureuse"), ("curieux", "curieuse"), ("désireux", "désireuse"), ("attaché", "attachée"),
+    ("spécialisé", "spécialisée"), ("formé", "formée"), ("habitué", "habituée"), ("intéressé", "intéressée"),
+    ("honoré", "honorée"), ("impliqué", "impliquée"), ("engagé", "engagée"), ("attiré", "attirée"),
+    ("séduit", "séduite"), ("fier", "fière"), ("rigoureux", "rigoureuse"), ("organisé", "organisée"),
+    ("déterminé", "déterminée"), ("sérieux", "sérieuse"), ("consciencieux", "consciencieuse"),
+    ("créatif", "créative"), ("animé", "animée"), ("doté", "dotée"), ("candidat", "candidate"),
+    ("enthousiasmé", "enthousiasmée"), ("sensibilisé", "sensibilisée"), ("expérimenté", "expérimentée"),
+)
+# « je suis (très) ravi », « je me sens prêt », « j'ai été formé »...
+FIRST_PERSON = re.compile(
+    r"\b(?:je\s+(?:suis|serais|serai|me\s+sens|reste|demeure|me\s+tiens|me\s+suis\s+(?:senti|sentie))"
+    r"|j['’](?:ai\s+été|étais))"
+    r"\s+(?:(?:très|particulièrement|vraiment|pleinement|profondément|donc|ainsi|également|aussi|toujours"
+    r"|entièrement|sincèrement|extrêmement|tout\s+à\s+fait|aujourd['’]hui|d['’]autant\s+plus|une?|un)\s+){0,3}"
+    r"([\wâàéèêëîïôöûüç]+)",
+    re.IGNORECASE,
+)
+# « ... motivée et convaincue », « ... curieuse, rigoureuse » : formes coordonnées qui suivent
+COORDINATED = re.compile(r"\s*(?:,|\bet\b|\bou\b)\s+([\wâàéèêëîïôöûüç]+)", re.IGNORECASE)
+# « Passionné par la donnée, je... » : apposition en début de phrase
+APPOSITION = re.compile(
+    r"(?:\A|[.!?…]\s+|\n)\s*([\wâàéèêëîïôöûüçÉÀ]+)\b[^.!?\n]{0,200}?,\s*(?:je|j['’])", re.IGNORECASE
+)
+
+
+def word_count(text):
+    """Nombre de mots comme un traitement de texte : « l'entreprise » compte pour un."""
+    return sum(1 for token in (text or "").split() if re.search(r"\w", token))
+
+
+def _excerpt(text, start, end, width=30):
+    """Extrait autour de text[start:end], sans déborder de sa ligne, pour situer l'anomalie."""
+    line_start = text.rfind("\n", 0, start) + 1
+    line_end = text.find("\n", end)
+    line_end = len(text) if line_end == -1 else line_end
+    return " ".join(text[max(line_start, start - width):min(line_end, end + width)].split())
+
+
+def _finding(rule, excerpt, correction):
+    return {"règle": rule, "extrait": excerpt, "correction": correction}
+
+
+def check_length(text, max_words=MAX_WORDS):
+    words = word_count(text)
+    if words <= max_words:
+        return []
+    return [_finding(
+        "longueur", f"{words} mots", f"raccourcir sous {max_words} mots (au moins {words - max_words} de moins)"
+    )]
+
+
+def check_characters(text):
+    findings = []
+    for character, (name, correction) in BANNED_CHARACTERS.items():
+        for match in re.finditer(re.escape(character), text):
+            findings.append(_finding(name, _excerpt(text, match.start(), match.end()), correction))
+    for match in BULLET_LINE.finditer(text):
+        findings.append(_finding("puce", _excerpt(text, match.start(), match.end()), BANNED_CHARACTERS["•"][1]))
+    return findings
+
+
+def check_capitalization(text):
+    findings = []
+    for match in LOWERCASE_START.finditer(text):
+        word = match.group(1)
+        findings.append(_finding(
+            "majuscule", _excerpt(text, match.start(1), match.end(1)), f"« {word} » → « {word[0].upper() + word[1:]} »"
+        ))
+    for match in CAPITALIZED_COMMON.finditer(text):
+        index = next(group for group in range(1, 4) if match.group(group))
+        word = match.group(index)
+        findings.append(_finding(
+            "majuscule", _excerpt(text, match.start(index), match.end(index)), f"« {word} » → « {word.lower()} »"
+        ))
+    return findings
+
+
+def check_gender(text, gender):
+    """Formes de la première personne accordées au mauvais genre (heuristique, liste de formes courantes)."""
+    if gender not in ("féminin", "masculin"):
+        return []
+    wrong_forms = {
+        (masculine if gender == "féminin" else feminine): (feminine if gender == "féminin" else masculine)
+        for masculine, feminine in GENDERED_FORMS
+    }
+    findings = {}
+
+    def check(match):
+        word = match.group(1)
+        right = wrong_forms.get(word.lower())
+        if right is None:
+            return False
+        if word[0].isupper():
+            right = right[0].upper() + right[1:]
+        findings[match.start(1)] = _finding(
+            f"accord ({gender})", _excerpt(text, match.start(1), match.end(1)), f"« {word} » → « {right} »"
+        )
+        return True
+
+    for pattern in (FIRST_PERSON, APPOSITION):
+        for match in pattern.finditer(text):
+            if pattern is APPOSITION:
+                check(match)
+                continue
+            # Attribut du sujet : la forme et celles qui lui sont coordonnées
+            while match and (check(match) or match.group(1).lower() in wrong_forms.values()):
+                match = COORDINATED.match(text, match.end(1))
+    return [findings[position] for position in sorted(findings)]
+
+
+def check_letter(text, gender, max_words=MAX_WORDS):
+    """Contrôles de forme d'une lettre, en local : longueur, caractères interdits, majuscules, accords.
+
+    Renvoie la liste des anomalies ({règle, extrait, correction}) ; vide si la lettre passe.
+    """
+    return (
+        check_length(text, max_words) + check_characters(text)
+        + check_capitalization(text) + check_gender(text, gender)
+    )
+
+
+def patch_list(findings):
+    """Anomalies en liste de corrections ciblées, à ajouter au prompt du relecteur."""
+    return "\n".join(
+        f"- {finding['règle']} : « {finding['extrait']} » : {finding['correction']}" for finding in findings
+    )
@@ -0,0 +1,635 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import export
+import lettercheck
+import retry
+import streaming
+import textprep
+import tracing
+import usage
+import utils
+from cache import content_hash
+
+
+# Libellés affichés à l'utilisateur quand une tâche se termine
+TASK_LABELS = {
+    "company_culture_task": "Recherche sur l'entreprise",
+    "role_requirements_task": "Analyse du poste",
+    "cv_analyzer_task": "Analyse du CV",
+    "draft_letter_task": "Premier jet de la lettre",
+    "review_letter_task": "Relecture",
+}
+
+# Mêmes valeurs par défaut que les curseurs de l'app
+DEFAULT_TEMPERATURES = {
+    "research_agent": 0.8,
+    "cv_extractor": 0.3,
+    "writer_agent": 0.6,
+    "review_agent": 0.4,
+}
+
+# Mode variantes : les analyses tournent une fois, rédaction + relecture N fois
+VARIANT_TASKS = ("draft_letter_task", "review_letter_task")
+VARIANT_TONES = ("", "chaleureux et enthousiaste", "sobre et très professionnel", "direct et concis", "créatif et audacieux")
+MAX_VARIANTS = len(VARIANT_TONES)
+VARIANT_TEMPERATURE_STEP = 0.15
+
+# Budgets de tokens des entrées après nettoyage (0 : pas de troncature)
+CV_MAX_TOKENS = int(os.getenv("CV_MAX_TOKENS", "4000"))
+JOB_MAX_TOKENS = int(os.getenv("JOB_MAX_TOKENS", "2000"))
+
+# Modes de relecture : voir lettercheck.REVIEW_MODES
+REVIEW_MODES = lettercheck.REVIEW_MODES
+DEFAULT_REVIEW_MODE = os.getenv("REVIEW_MODE", "ciblée")
+
+PUNCTUATION_RULES = ". Important utiliser les principes de ponctuation et d'orthographe en français : pas de tiret semi-quadratin, majuscules uniquement pour les nom propres et en début de phrase."
+
+
+def _step_callback(progress, tracker=None):
+    """Traduit les étapes des agents CrewAI en messages de progression.
+
+    Vérifie aussi le budget à chaque étape : un dépassement arrête la tâche.
+    """
+    def callback(step):
+        tool = getattr(step, "tool", None)
+        if tool:
+            progress(f"🔧 Utilisation de l'outil : {tool}")
+        if tracker is not None:
+            tracker.check()
+    return callback
+
+
+def _task_callback(progress):
+    def callback(output):
+        label = TASK_LABELS.get(output.name, output.name)
+        progress(f"✅ {label} terminé")
+    return callback
+
+
+class Checkpointer:
+    """Points de sauvegarde des tâches d'une tentative de génération.
+
+    La clé d'une tâche combine l'identifiant de tentative, le modèle, le CV,
+    ses prompts formatés (qui contiennent déjà entreprise, annonce, profil,
+    genre et ton), ceux de son agent, son modèle et sa température et les
+    sorties des tâches dont elle dépend. Seule une reprise qui repasse le
+    même `params["attempt_id"]` (bouton « Reprendre » après un échec)
+    retrouve les sorties déjà calculées ; sans identifiant ou avec `fresh`
+    (régénération forcée), rien n'est restauré. `discard()` efface les
+    points de sauvegarde une fois la génération terminée.
+    """
+
+    def __init__(self, params, model, store=None, fresh=False):
+        self.store = store if store is not None else utils.checkpoint_store
+        attempt_id = params.get("attempt_id")
+        # fresh : tout est recalculé, les sauvegardes existantes sont écrasées
+        self.resumable = attempt_id is not None and not fresh
+        self.base = content_hash(attempt_id or uuid.uuid4().hex, model, params["cv_md"])
+        self._keys = set()
+        self._lock = threading.Lock()
+
+    def key(self, task):
+        agent = task.agent
+        upstream = [dep.output.raw if dep.output else "" for dep in (task.context if isinstance(task.context, list) else [])]
+        return content_hash(
+            self.base, task.name, task.description, task.expected_output,
+            agent.role, agent.goal, agent.backstory, usage.llm_model(agent.llm), str(agent.llm.temperature), *upstream,
+        )
+
+    def restore(self, task):
+        if not self.resumable:
+            return False
+        key = self.key(task)
+        raw = self.store.get(key)
+        if raw is None:
+            return False
+        utils.restore_task_output(task, raw, task.agent)
+        with self._lock:
+            self._keys.add(key)
+        return True
+
+    def save(self, task):
+        key = self.key(task)
+        self.store.set(key, task.output.raw)
+        with self._lock:
+            self._keys.add(key)
+
+    def discard(self):
+        """Efface les points de sauvegarde de la tentative (génération réussie)."""
+        with self._lock:
+            keys, self._keys = list(self._keys), set()
+        if keys:
+            self.store.delete(keys)
+
+
+def _kickoff(task, progress, tracker):
+    from crewai import Crew
+
+    crew = Crew(
+        agents=[task.agent],
+        tasks=[task],
+        verbose=True,
+        step_callback=_step_callback(progress, tracker),
+        task_callback=_task_callback(progress),
+    )
+    crew.kickoff()
+
+
+def _run_task(task, progress, tracker, checkpoints=None):
+    """Exécute une tâche seule dans son propre Crew et renvoie sa durée (secondes).
+
+    Une erreur passagère (quota, timeout) relance la tâche avec backoff, dans
+    la limite de relances de la génération. La consommation de tokens de la
+    tâche (écart des compteurs de son LLM, relances comprises) est
+    enregistrée dans `tracker` ; la sortie est sauvegardée dans `checkpoints`.
+    """
+    before = usage.usage_snapshot(task.agent.llm)
+    start = time.perf_counter()
+    with tracing.span("task", label=task.name, agent=task.agent.role) as span:
+        try:
+            retry.call_with_retry(
+                lambda: _kickoff(task, progress, tracker), TASK_LABELS.get(task.name, task.name), progress
+            )
+        finally:
+            task_usage = usage.usage_delta(before, usage.usage_snapshot(task.agent.llm))
+            tracker.record(task.name, task.agent.role, task_usage, usage.llm_model(task.agent.llm))
+            span.set(prompt_tokens=task_usage["prompt_tokens"], completion_tokens=task_usage["completion_tokens"])
+    if checkpoints is not None:
+        checkpoints.save(task)
+    return time.perf_counter() - start
+
+
+def run_stages(stages, tasks, progress=print, tracker=None, checkpoints=None, before_stage=None):
+    """Exécute les étapes dans l'ordre, les tâches d'une même étape en parallèle.
+
+    Une tâche dont la sortie est déjà connue (cache ou point de sauvegarde
+    de `checkpoints`) est sautée. Deux tâches parallèles confiées au même
+    agent reçoivent chacune leur copie de l'agent (avec son propre LLM),
+    CrewAI ne supportant pas qu'un agent exécute deux tâches à la fois. Le budget de `tracker` est vérifié entre les étapes.
+    `before_stage(stage)` est appelé avant chaque étape (pré-contrôle du
+    brouillon) : il peut compléter les prompts ou fournir des sorties.
+    Renvoie les durées par tâche et la durée totale.
+    """
+    if tracker is None:
+        tracker = usage.UsageTracker(utils.default_model())
+    timings = {}
+    start = time.perf_counter()
+    for stage in stages:
+        if before_stage is not None:
+            before_stage(stage)
+        if checkpoints is not None:
+            for name in stage:
+                if tasks[name].output is None and checkpoints.restore(tasks[name]):
+                    progress(f"♻️ {TASK_LABELS.get(name, name)} : repris du point de sauvegarde")
+        pending = [tasks[name] for name in stage if tasks[name].output is None]
+        seen_agents = set()
+        for task in pending:
+            if id(task.agent) in seen_agents:
+                copied = task.agent.copy()
+                copied.llm = utils.clone_llm(task.agent.llm)
+                task.agent = copied
+            seen_agents.add(id(task.agent))
+            tracker.watch(task.agent.llm)
+
+        if pending:
+            tracker.check()
+            with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+                futures = {
+                    task.name: pool.submit(tracing.wrap(_run_task), task, progress, tracker, checkpoints)
+                    for task in pending
+                }
+                for name, future in futures.items():
+                    timings[name] = future.result()
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def critical_path(timings, stages):
+    """Durée théorique minimale : somme, par étape, de la tâche la plus lente."""
+    return sum(max((timings.get(name, 0.0) for name in stage), default=0.0) for stage in stages)
+
+
+def prepare_params(params):
+    """Nettoie le CV et l'annonce avant qu'ils n'atteignent les prompts.
+
+    Renvoie (params nettoyés, rapport tokens avant/après pour le CV et l'annonce).
+    """
+    cv_md, job_description, report = textprep.prepare_inputs(
+        params["cv_md"], params["job_description"], CV_MAX_TOKENS, JOB_MAX_TOKENS
+    )
+    return dict(params, cv_md=cv_md, job_description=job_description), report
+
+
+def _build_context(params):
+    """Variables injectées dans les prompts des agents et des tâches."""
+    return {
+        "candidate_profile": (params["candidate_profile"] + PUNCTUATION_RULES) or "Candidat",
+        "company_url": params["company_url"],
+        "hiring_needs": params["job_description"],
+        "gender": params["gender"],
+        "tone": f" Registre demandé : {params['tone']}." if params.get("tone") else "",
+    }
+
+
+def build_tasks(params, skip=()):
+    """Construit agents et tâches pour `params` ; renvoie (tasks, stages).
+
+    `params["agent_llms"]` (facultatif, nom d'agent -> {provider, model,
+    base_url}) surcharge les backends déclarés dans agents.yaml ;
+    `params["credentials"]` donne les clés API de la session.
+    """
+    context = _build_context(params)
+    agents = utils.load_agents_from_yaml(
+        "agents.yaml", params["temperatures"], context, cv_text=params["cv_md"], model=params.get("model"),
+        llms=params.get("agent_llms"), credentials=params.get("credentials"),
+    )
+    return utils.load_tasks_from_yaml("tasks.yaml", context, agents=agents, skip=skip)
+
+
+def run_single_task(params, task_name, progress=print):
+    """Exécute une seule tâche du graphe (sans dépendances) et renvoie sa sortie brute.
+
+    Sert à mutualiser une tâche entre plusieurs générations, par exemple
+    l'analyse du CV en mode lot.
+    """
+    params, tasks, stages = _single_task_graph(params, task_name)
+    _run_alone(params, tasks, stages, progress)
+    return tasks[task_name].output.raw
+
+
+def run_research(params, progress=print):
+    """Rapport sur l'entreprise de `params`, repris du cache de recherche s'il y est.
+
+    Sert au mode lot (une recherche par entreprise distincte) ; la clé est
+    celle des générations (_research_key), un rapport produit par l'un sert
+    donc à l'autre.
+    """
+    params, tasks, stages = _single_task_graph(params, "company_culture_task")
+    research_key = _research_key(params, tasks)
+    if _restore_known_outputs(tasks, None, research_key, progress):
+        _run_alone(params, tasks, stages, progress)
+        utils.research_cache.set(research_key, tasks["company_culture_task"].output.raw)
+    return tasks["company_culture_task"].output.raw
+
+
+def _single_task_graph(params, task_name):
+    params, _ = prepare_params(params)
+    task_names = list(utils.load_yaml_config("tasks.yaml"))
+    tasks, stages = build_tasks(params, skip=[name for name in task_names if name != task_name])
+    return params, tasks, stages
+
+
+def _run_alone(params, tasks, stages, progress):
+    model = params.get("model") or utils.default_model()
+    checkpoints = Checkpointer(params, model)
+    with retry.run_budget():
+        run_stages(stages, tasks, progress, usage.UsageTracker.from_env(model), checkpoints)
+    checkpoints.discard()
+
+
+def _research_key(params, tasks):
+    """Clé du rapport entreprise en cache : entreprise et modèle de l'agent de recherche."""
+    return utils.research_cache_key(
+        params["company_url"], model=usage.llm_model(tasks["company_culture_task"].agent.llm)
+    )
+
+
+def _restore_known_outputs(tasks, known_outputs, research_key, progress, refresh=False):
+    """Restaure les sorties déjà connues, dont le rapport entreprise en cache.
+
+    `refresh` ignore le rapport en cache (il sera remplacé). Renvoie True si
+    la recherche entreprise doit quand même tourner.
+    """
+    known_outputs = dict(known_outputs or {})
+    if not refresh and "company_culture_task" in tasks and "company_culture_task" not in known_outputs:
+        cached_report = utils.research_cache.get(research_key)
+        if cached_report:
+            progress("🗂️ Rapport sur l'entreprise récupéré du cache, recherche web ignorée")
+            known_outputs["company_culture_task"] = cached_report
+
+    for task_name, raw in known_outputs.items():
+        if task_name in tasks:
+            utils.restore_task_output(tasks[task_name], raw, tasks[task_name].agent)
+    return "company_culture_task" in tasks and tasks["company_culture_task"].output is None
+
+
+def _precheck_review(tasks, gender, mode, progress):
+    """Pré-contrôle local du brouillon, juste avant la relecture (voir REVIEW_MODES).
+
+    Les anomalies (lettercheck) sont ajoutées au prompt du relecteur sous
+    forme de corrections ciblées. En mode rapide, un brouillon sans anomalie
+    devient la lettre finale sans appel au relecteur. Renvoie le rapport
+    {mode, anomalies, relecture_sautée, durée}.
+    """
+    draft, review = tasks["draft_letter_task"], tasks["review_letter_task"]
+    start = time.perf_counter()
+    with tracing.span("precheck", label=mode) as span:
+        findings = lettercheck.check_letter(draft.output.raw, gender)
+        span.set(findings=len(findings))
+    skipped = mode == "rapide" and not findings
+    if skipped:
+        utils.restore_task_output(review, draft.output.raw, review.agent)
+        progress("⚡ Brouillon conforme au pré-contrôle : relecture sautée (mode rapide)")
+    elif findings:
+        review.description += (
+            "\n\nCorrections repérées par le contrôle automatique, à appliquer en priorité :\n"
+            + lettercheck.patch_list(findings)
+        )
+        progress(f"🔎 Pré-contrôle : {len(findings)} correction(s) ciblée(s) transmise(s) au relecteur")
+    else:
+        review.description += (
+            "\n\nContrôle automatique : longueur, ponctuation, majuscules et accords déjà conformes, "
+            "concentre-toi sur le fond."
+        )
+    return {
+        "mode": mode,
+        "anomalies": findings,
+        "relecture_sautée": skipped,
+        "durée": time.perf_counter() - start,
+    }
+
+
+def run_analysis(params, progress=print):
+    """Exécute une fois les tâches amont (entreprise, poste, CV).
+
+    Renvoie {"outputs": nom de tâche -> texte, "timings", "usage"} ; les
+    sorties servent de known_outputs aux générations qui suivent. Leurs
+    points de sauvegarde restent jusqu'à expiration : une reprise des
+    variantes (même attempt_id) n'a pas à refaire les analyses.
+    """
+    params, _ = prepare_params(params)
+    model = params.get("model") or utils.default_model()
+    tracker = usage.UsageTracker.from_env(model, params.get("budget"))
+    tasks, stages = build_tasks(params, skip=VARIANT_TASKS)
+
+    fresh = bool(params.get("regenerate")) and not params.get("resume")
+    research_key = _research_key(params, tasks)
+    run_research = _restore_known_outputs(tasks, None, research_key, progress, refresh=fresh)
+    with retry.run_budget():
+        timings = run_stages(stages, tasks, progress, tracker, Checkpointer(params, model, fresh=fresh))
+    if run_research and tasks["company_culture_task"].output:
+        utils.research_cache.set(research_key, tasks["company_culture_task"].output.raw)
+
+    return {
+        "outputs": {name: task.output.raw for name, task in tasks.items()},
+        "timings": timings,
+        "usage": tracker.summary(),
+    }
+
+
+def run_generation(params, progress=print, known_outputs=None):
+    """Exécute tout le pipeline de génération, hors du thread Streamlit.
+
+    `params` contient cv_md, company_url, job_description, candidate_profile,
+    gender, temperatures et include_draft. `progress` reçoit les messages
+    d'avancement. `known_outputs` (nom de tâche -> texte) fournit des sorties
+    déjà calculées : ces tâches ne sont pas exécutées. Renvoie un dict avec la
+    lettre finale, le brouillon, les paramètres de session et le fichier Word.
+    Le CV et l'annonce sont nettoyés au préalable (voir prepare_params).
+    Chaque tâche terminée est sauvegardée (Checkpointer) : relancer une
+    génération qui a échoué avec le même `params["attempt_id"]` reprend à la
+    première tâche non terminée. Les points de sauvegarde sont effacés quand
+    la génération réussit.
+    Les spans de la génération portent l'identifiant de la requête en cours
+    (celui du job s'il y en a un), renvoyé sous "request_id".
+    Si la page suit un flux (streaming.capture), rédaction et relecture y
+    arrivent jeton par jeton ; "first_text" donne alors le délai (s) avant
+    le premier texte de lettre affiché, None sinon.
+    Une génération identique (utils.generation_cache_key) déjà terminée ou
+    en cours n'est pas relancée : son résultat est renvoyé avec "memo" à
+    True. `params["regenerate"]` force une nouvelle génération, qui remplace
+    le résultat mémorisé, les points de sauvegarde et le rapport entreprise
+    en cache ; avec `params["resume"]`, elle reprend une régénération qui a
+    échoué. Les générations à partir de `known_outputs`
+    (variantes, lot) ne sont pas mémorisées.
+    """
+    if known_outputs is not None:
+        return _traced_generation(params, progress, known_outputs)
+
+    key = utils.generation_cache_key(params)
+    regenerate = bool(params.get("regenerate"))
+    if not regenerate and key in utils.result_cache:
+        progress("♻️ Lettre identique déjà générée ou en cours : résultat réutilisé")
+    computed = []
+
+    def generate():
+        computed.append(True)
+        return _traced_generation(params, progress, None)
+
+    result = utils.result_cache.get_or_call(key, generate, refresh=regenerate)
+    # Le dict mémorisé est partagé : copie pour la session qui le réutilise
+    return result if computed else dict(result, memo=True, first_text=None)
+
+
+def _traced_generation(params, progress, known_outputs):
+    with tracing.request() as request_id, retry.run_budget(), \
+            tracing.span("generation", label="lettre", company=params["company_url"]):
+        result = _run_generation(params, progress, known_outputs)
+    result["request_id"] = request_id
+    result["memo"] = False
+    return result
+
+
+def _run_generation(params, progress, known_outputs):
+    params, prep_report = prepare_params(params)
+    temperatures = params["temperatures"]
+    model = params.get("model") or utils.default_model()
+    tracker = usage.UsageTracker.from_env(model, params.get("budget"))
+
+    # Étape 1: Chargement des agents (températures dynamiques) et du graphe des tâches (tasks.yaml)
+    progress("🤖 Configuration des agents IA...")
+    tasks, stages = build_tasks(params)
+
+    # Page qui suit la génération : rédaction et relecture affichées au fil de l'eau
+    live = streaming.current()
+    if live is not None:
+        for name in VARIANT_TASKS:
+            if name in tasks:
+                tasks[name].agent.llm = utils.clone_llm(tasks[name].agent.llm, stream=True)
+
+    # Rapport de culture déjà produit pour cette entreprise : on saute la recherche
+    # Régénération forcée : ni point de sauvegarde ni rapport en cache, sauf
+    # pour reprendre une régénération qui a échoué (bouton « Reprendre »)
+    fresh = bool(params.get("regenerate")) and not params.get("resume")
+    research_key = _research_key(params, tasks)
+    run_research = _restore_known_outputs(tasks, known_outputs, research_key, progress, refresh=fresh)
+    culture_task = tasks["company_culture_task"]
+
+    # Pré-contrôle local du brouillon avant la relecture (sauf mode "complète")
+    review_mode = params.get("review_mode") or DEFAULT_REVIEW_MODE
+    if review_mode not in REVIEW_MODES:
+        raise ValueError(f"Mode de relecture inconnu: {review_mode}")
+    precheck = None
+
+    def before_stage(stage):
+        nonlocal precheck
+        if review_mode != "complète" and "review_letter_task" in stage and tasks["review_letter_task"].output is None:
+            precheck = _precheck_review(tasks, params["gender"], review_mode, progress)
+
+    # Étape 2: Exécution des étapes du graphe
+    progress("🎯 Génération de la lettre de motivation...")
+    checkpoints = Checkpointer(params, model, fresh=fresh)
+    timings = run_stages(stages, tasks, progress, tracker, checkpoints, before_stage)
+    checkpoints.discard()
+    usage_summary = tracker.summary()
+
+    if run_research and culture_task.output:
+        utils.research_cache.set(research_key, culture_task.output.raw)
+
+    # Étape 3: Export (la lettre finale est la sortie de la dernière étape)
+    final_text = tasks[stages[-1][-1]].output.raw
+    # Relecture sautée : la lettre finale est le brouillon, inutile de le joindre deux fois
+    review_skipped = bool(precheck and precheck["relecture_sautée"])
+    draft_text = tasks["draft_letter_task"].output.raw if params["include_draft"] and not review_skipped else None
+    job_description = params["job_description"]
+    session_params = {
+        "Entreprise": params["company_url"],
+        "Genre Candidat": params["gender"],
+        "Profil Candidat": params["candidate_profile"] + PUNCTUATION_RULES,
+        "Température Recherche": temperatures["research_agent"],
+        "Température Extracteur CV": temperatures["cv_extractor"],
+        "Température Rédacteur": temperatures["writer_agent"],
+        "Température Relecteur": temperatures["review_agent"],
+        "Description du poste": job_description[:500] + "..." if len(job_description) > 500 else job_description, # On tronque si c'est immense
+        "Modèle": model,
+        "Relecture": review_mode + (" (sautée : brouillon conforme)" if review_skipped else ""),
+        "Tokens (prompt / completion)": f"{usage_summary['total'].get('prompt_tokens', 0)} / {usage_summary['total'].get('completion_tokens', 0)}",
+        "Coût estimé": usage.format_cost(usage_summary['total'].get('cost')),
+        "Tokens CV (avant / après nettoyage)": f"{prep_report['cv']['avant']} / {prep_report['cv']['après']}",
+        "Tokens annonce (avant / après nettoyage)": f"{prep_report['annonce']['avant']} / {prep_report['annonce']['après']}",
+    }
+    # Agents sur un autre backend (clé llm: de agents.yaml) : modèle de chacun
+    agent_models = {task.agent.role: usage.llm_model(task.agent.llm) for task in tasks.values()}
+    if set(agent_models.values()) != {model}:
+        session_params["Modèles par agent"] = ", ".join(f"{role} : {name}" for role, name in agent_models.items())
+    for agent_role, agent_usage in usage_summary["agents"].items():
+        session_params[f"Tokens - {agent_role}"] = f"{agent_usage['total_tokens']} ({usage.format_cost(agent_usage['cost'])})"
+    docx_file = utils.create_docx(final_text, draft_text, session_params)
+
+    return {
+        "final_text": final_text,
+        "draft_text": draft_text,
+        "session_params": session_params,
+        "docx": docx_file.getvalue(),
+        "timings": timings,
+        "stages": stages,
+        "usage": usage_summary,
+        "prep": prep_report,
+        "first_text": live.first_text if live is not None else None,
+        "precheck": precheck,
+    }
+
+
+def make_variants(count, temperatures):
+    """`count` variantes : un ton chacune, température du rédacteur échelonnée autour du réglage.
+
+    La première garde les réglages tels quels ; les suivantes alternent
+    au-dessus et en dessous (+0.15, -0.15, +0.3...), bornées à [0, 1].
+    """
+    variants = []
+    for index in range(min(count, MAX_VARIANTS)):
+        offset = VARIANT_TEMPERATURE_STEP * ((index + 1) // 2) * (1 if index % 2 else -1)
+        tone = VARIANT_TONES[index]
+        variants.append({
+            "label": f"Variante {index + 1}" + (f" ({tone})" if tone else ""),
+            "tone": tone,
+            "temperatures": {"writer_agent": round(min(1.0, max(0.0, temperatures["writer_agent"] + offset)), 2)},
+        })
+    return variants
+
+
+def run_variants(params, variants, progress=print):
+    """Génère plusieurs variantes d'une lettre en mutualisant les analyses.
+
+    Les tâches amont tournent une fois (run_analysis) ; rédaction et relecture
+    tournent ensuite en parallèle pour chaque variante ({label, tone,
+    temperatures} : surcharges de params). Renvoie les variantes, un DOCX
+    commun, les durées et la consommation totale.
+    """
+    with tracing.request() as request_id, retry.run_budget(), \
+            tracing.span("variants", label="variantes", count=len(variants)):
+        start = time.perf_counter()
+        progress("🔎 Analyses de l'entreprise, du poste et du CV (une seule fois pour toutes les variantes)...")
+        analysis = run_analysis(params, progress)
+        analysis_seconds = time.perf_counter() - start
+
+        def generate(variant):
+            variant_params = dict(
+                params,
+                tone=variant.get("tone", ""),
+                temperatures={**params["temperatures"], **variant.get("temperatures", {})},
+            )
+            result = run_generation(variant_params, progress=lambda message: None, known_outputs=analysis["outputs"])
+            progress(f"✅ {variant['label']} terminée")
+            return {
+                **variant,
+                "temperatures": variant_params["temperatures"],
+                "final_text": result["final_text"],
+                "draft_text": result["draft_text"],
+                "timings": result["timings"],
+                "usage": result["usage"],
+            }
+
+        progress(f"✍️ Rédaction de {len(variants)} variantes en parallèle...")
+        with ThreadPoolExecutor(max_workers=len(variants)) as pool:
+            results = list(pool.map(tracing.wrap(generate), variants))
+
+    model = params.get("model") or utils.default_model()
+    total = usage.add_usage({}, analysis["usage"]["total"])
+    for result in results:
+        usage.add_usage(total, result["usage"]["total"])
+    total["cost"] = usage.sum_costs(
+        [analysis["usage"]["total"]["cost"]] + [result["usage"]["total"]["cost"] for result in results]
+    )
+
+    session_params = {
+        "Entreprise": params["company_url"],
+        "Genre Candidat": params["gender"],
+        "Modèle": model,
+        "Tokens analyses (une fois)": analysis["usage"]["total"].get("total_tokens", 0),
+        "Coût estimé total": usage.format_cost(total["cost"]),
+    }
+    for result in results:
+        session_params[result["label"]] = (
+            f"rédacteur {result['temperatures']['writer_agent']}, relecteur {result['temperatures']['review_agent']}, "
+            f"{result['usage']['total'].get('total_tokens', 0)} tokens"
+        )
+    docx_file = export.create_variants_docx(
+        [(result["label"], result["final_text"], result["draft_text"]) for result in results], session_params
+    )
+
+    return {
+        "variants": results,
+        "docx": docx_file.getvalue(),
+        "session_params": session_params,
+        "timings": {"analyses": analysis_seconds, "total": time.perf_counter() - start},
+        "usage": total,
+        "request_id": request_id,
+    }
+
+
+def generate_letter(cv_md, company, job_description, candidate_profile="", gender="féminin",
+                    temperatures=None, include_draft=True, model=None, budget=None, progress=print,
+                    regenerate=False, review_mode=None):
+    """Service de génération d'une lettre, utilisable hors de Streamlit (CLI, API HTTP).
+
+    Renvoie le même dict que run_generation (final_text, draft_text, docx, ...) ;
+    `regenerate` ignore une lettre identique déjà générée ; `review_mode` : voir REVIEW_MODES.
+    """
+    return run_generation({
+        "cv_md": cv_md,
+        "company_url": company,
+        "job_description": job_description,
+        "candidate_profile": candidate_profile,
+        "gender": gender,
+        "temperatures": {**DEFAULT_TEMPERATURES, **(temperatures or {})},
+        "include_draft": include_draft,
+        "model": model,
+        "budget": budget,
+        "regenerate": regenerate,
+        "review_mode": review_mode,
+    }, progress=progress)
@@ -0,0 +1,99 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from usage import BudgetExceededError
+
+
+# Relances des erreurs passagères (quota, timeout, 5xx), plafonnées par génération
+MAX_RETRIES_PER_RUN = int(os.getenv("MAX_RETRIES_PER_RUN", "4"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "2"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+
+TRANSIENT_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+# Noms des erreurs réseau/quota d'openai, litellm, httpx et requests (sans les importer)
+TRANSIENT_ERRORS = {
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "ServiceUnavailableError", "Timeout", "TimeoutError", "ConnectionError",
+    "ConnectTimeout", "ReadTimeout", "ConnectError", "RemoteProtocolError",
+}
+
+_budget = contextvars.ContextVar("retry_budget", default=None)
+
+
+class RetryBudget:
+    """Nombre total de relances autorisées pour une génération, partagé entre ses threads."""
+
+    def __init__(self, max_retries=MAX_RETRIES_PER_RUN):
+        self.max_retries = max_retries
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.used >= self.max_retries:
+                return False
+            self.used += 1
+            return True
+
+
+@contextmanager
+def run_budget(max_retries=None):
+    """Plafond de relances du bloc ; une génération imbriquée réutilise celui de la génération englobante."""
+    if _budget.get() is not None:
+        yield _budget.get()
+        return
+    budget = RetryBudget(MAX_RETRIES_PER_RUN if max_retries is None else max_retries)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def is_transient(error):
+    """Vrai pour une erreur qui a des chances de passer en réessayant (quota, réseau, 5xx)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, BudgetExceededError):
+            return False
+        if type(error).__name__ in TRANSIENT_ERRORS or _status_code(error) in TRANSIENT_STATUS:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def backoff_delay(attempt):
+    """Attente exponentielle avec gigue : ~2 s, 4 s, 8 s... bornée à RETRY_MAX_DELAY."""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def call_with_retry(fn, label, progress=None):
+    """Appelle `fn` et la relance sur erreur passagère, dans la limite du budget de la génération."""
+    budget = _budget.get() or RetryBudget()
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if not is_transient(e) or not budget.take():
+                raise
+            delay = backoff_delay(attempt)
+            if progress:
+                progress(f"⏳ {label} : erreur passagère ({type(e).__name__}), nouvel essai dans {delay:.0f} s "
+                         f"({budget.used}/{budget.max_retries} relances)")
+            time.sleep(delay)
+            attempt += 1
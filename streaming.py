@@ -0,0 +1,120 @@
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import textprep
+import tracing
+
+
+# Les agents CrewAI répondent au format ReAct : seul ce qui suit ce marqueur est la lettre
+FINAL_ANSWER = "Final Answer:"
+
+_stream = contextvars.ContextVar("letter_stream", default=None)
+
+
+class LetterStream:
+    """Texte des tâches de rédaction reçu jeton par jeton, relu par la page.
+
+    Créé à la soumission de la génération : les délais mesurés (premier
+    jeton, premier texte visible) comprennent donc l'attente du job et les
+    analyses, c'est-à-dire ce que l'utilisateur attend réellement.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_chunk = None
+        self.first_text = None
+        self._texts = {}
+        self._current = None
+        self._lock = threading.Lock()
+
+    def append(self, task_name, chunk):
+        now = time.perf_counter()
+        with self._lock:
+            if self.first_chunk is None:
+                self.first_chunk = now - self.started
+            # Réponses successives d'une tâche (après un outil) mises bout à bout :
+            # visible_text ne garde que la dernière réponse finale
+            self._texts[task_name] = self._texts.get(task_name, "") + chunk
+            self._current = task_name
+            if self.first_text is None and visible_text(self._texts[task_name]):
+                self.first_text = now - self.started
+                tracing.metrics.observe("stream.first_text", task_name, self.first_text)
+
+    def snapshot(self):
+        """(tâche en cours, texte visible) ou (None, "") avant le premier jeton."""
+        with self._lock:
+            if self._current is None:
+                return None, ""
+            return self._current, visible_text(self._texts[self._current])
+
+
+def visible_text(raw):
+    """Partie affichable d'une réponse ReAct : ce qui suit « Final Answer: »."""
+    _, marker, answer = raw.rpartition(FINAL_ANSWER)
+    return answer.strip() if marker else ""
+
+
+def current():
+    return _stream.get()
+
+
+@contextmanager
+def capture(stream):
+    """Envoie vers `stream` les jetons des LLM en streaming appelés dans le bloc.
+
+    Les jetons sont relayés par le bus d'événements de CrewAI, qui appelle
+    ses gestionnaires de LLMStreamChunkEvent dans le thread de l'appel :
+    le flux en cours est retrouvé par contextvar (tracing.wrap le fait
+    suivre dans les pools de threads). `stream` à None : pas de flux.
+    """
+    if stream is not None:
+        _register()
+    token = _stream.set(stream)
+    try:
+        yield stream
+    finally:
+        _stream.reset(token)
+
+
+def _on_chunk(source, event):
+    stream = _stream.get()
+    if stream is not None and event.chunk:
+        stream.append(event.task_name or "", event.chunk)
+
+
+@functools.lru_cache(maxsize=1)
+def _register():
+    """Abonne _on_chunk au bus d'événements de CrewAI, une fois par process."""
+    from crewai.events import LLMStreamChunkEvent, crewai_event_bus
+
+    crewai_event_bus.on(LLMStreamChunkEvent)(_on_chunk)
+
+
+def count_usage(llm):
+    """Estime les tokens des appels en streaming quand le fournisseur ne les renvoie pas.
+
+    En streaming, le client OpenAI natif de CrewAI ne relève pas l'usage :
+    sans cette estimation (tiktoken), budget et coût ignoreraient la
+    rédaction et la relecture.
+    """
+    call = llm.call
+
+    @functools.wraps(call)
+    def counted_call(messages, *args, **kwargs):
+        before = llm.get_token_usage_summary().successful_requests
+        response = call(messages, *args, **kwargs)
+        if llm.get_token_usage_summary().successful_requests == before:
+            prompt = messages if isinstance(messages, str) else "\n".join(
+                str(message.get("content") or "") for message in messages
+            )
+            llm._track_token_usage_internal({
+                "prompt_tokens": textprep.estimate_tokens(prompt),
+                "completion_tokens": textprep.estimate_tokens(str(response or "")),
+            })
+        return response
+
+    llm.call = counted_call
+    return llm
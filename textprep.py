@@ -0,0 +1,129 @@
+import re
+from functools import lru_cache
+
+
+# Sections d'annonce sans intérêt pour la lettre (avantages, mentions légales...),
+# reconnues seulement sur une ligne de titre (HEADING_LINE)
+BOILERPLATE_HEADINGS = re.compile(
+    r"^\W*(avantages|nos avantages|ce que nous (vous )?offrons|ce que l'on (vous )?offre|pourquoi nous rejoindre"
+    r"|benefits|perks|what we offer|why join us|mentions l[ée]gales|donn[ée]es personnelles|rgpd|gdpr|privacy"
+    r"|[ée]galit[ée] des chances|diversit[ée] et inclusion|equal opportunit(y|ies)|processus de recrutement"
+    r"|[àa] propos de nous|about us)\b",
+    re.IGNORECASE,
+)
+# Phrases juridiques isolées, supprimées où qu'elles soient (formules complètes :
+# « cookies » ou « données personnelles » seuls peuvent faire partie du poste)
+LEGAL_LINE = re.compile(
+    r"(equal opportunity employer|conform[ée]ment (au|à la) (rgpd|r[èe]glement)"
+    r"|(traitement|protection) de vos donn[ée]es personnelles|vos donn[ée]es personnelles (sont|seront)"
+    r"|tous nos postes sont ouverts aux personnes en situation de handicap|without regard to race"
+    r"|(ce site|nous) utilis(e|ons) des cookies|(this|our) (web)?site uses cookies|accept(er|ez)? (all |tous les )?cookies"
+    r"|all rights reserved|tous droits r[ée]serv[ée]s)",
+    re.IGNORECASE,
+)
+HEADING_LINE = re.compile(r"^\s*(#{1,6}\s+\S.*|\*\*[^*]+\*\*\s*:?|[^.!?]{2,60}:)\s*$")
+
+IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+# pymupdf4llm remplace les images par ce type de marqueur
+OMITTED_PICTURE = re.compile(r"\*\*==>.*?<==\*\*")
+TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text):
+    """Nombre de tokens (tiktoken si disponible, sinon ~4 caractères par token)."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text or "", disallowed_special=()))
+    return (len(text or "") + 3) // 4
+
+
+def _truncate_to_tokens(text, max_tokens):
+    """Coupe à la dernière ligne complète qui tient dans le budget."""
+    if not max_tokens or estimate_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept) + "\n\n[... texte tronqué ...]"
+
+
+def _collapse_blank_lines(lines):
+    text = "\n".join(line.rstrip() for line in lines)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def clean_job_description(text, max_tokens=None):
+    """Retire le superflu d'une annonce : sections avantages/légales, phrases juridiques, lignes en double.
+
+    Si le nettoyage ne laisse rien, l'annonce est gardée telle quelle.
+    """
+    lines = []
+    seen = set()
+    in_boilerplate = False
+    for line in (text or "").splitlines():
+        stripped = line.strip()
+        if HEADING_LINE.match(stripped):
+            in_boilerplate = bool(BOILERPLATE_HEADINGS.match(stripped))
+            if in_boilerplate:
+                continue
+        if in_boilerplate or LEGAL_LINE.search(stripped):
+            continue
+
+        key = " ".join(stripped.casefold().split())
+        if key and key in seen:
+            continue
+        if key:
+            seen.add(key)
+        lines.append(line)
+    cleaned = _collapse_blank_lines(lines) or (text or "").strip()
+    return _truncate_to_tokens(cleaned, max_tokens)
+
+
+def compress_cv_markdown(markdown, max_tokens=None):
+    """Allège le markdown produit par pymupdf4llm : images, liens, tableaux vides, espaces."""
+    text = IMAGE.sub("", markdown or "")
+    text = OMITTED_PICTURE.sub("", text)
+    text = LINK.sub(r"\1", text)
+
+    lines = []
+    for line in text.splitlines():
+        if TABLE_SEPARATOR.match(line):
+            continue
+        if line.strip().startswith("|"):
+            # Ligne de tableau : on garde le contenu des cellules non vides
+            cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+            cells = [cell for cell in cells if cell]
+            if not cells:
+                continue
+            line = " · ".join(cells)
+        line = re.sub(r"[ \t]{2,}", " ", line)
+        if line.strip() in ("-----", "---"):
+            continue
+        lines.append(line)
+    return _truncate_to_tokens(_collapse_blank_lines(lines), max_tokens)
+
+
+def prepare_inputs(cv_md, job_description, cv_max_tokens=None, job_max_tokens=None):
+    """Nettoie le CV et l'annonce avant les prompts ; renvoie (cv, annonce, rapport tokens avant/après)."""
+    cleaned_cv = compress_cv_markdown(cv_md, cv_max_tokens)
+    cleaned_job = clean_job_description(job_description, job_max_tokens)
+    report = {
+        "cv": {"avant": estimate_tokens(cv_md), "après": estimate_tokens(cleaned_cv)},
+        "annonce": {"avant": estimate_tokens(job_description), "après": estimate_tokens(cleaned_job)},
+    }
+    return cleaned_cv, cleaned_job, report
@@ -0,0 +1,161 @@
+import os
+from typing import Any
+
+from crewai.tools import BaseTool
+from crewai_tools import SerperDevTool, WebsiteSearchTool
+from pydantic import BaseModel
+
+import retry
+import tracing
+from cache import ClientPool, SingleFlightCache, content_hash
+
+
+# Résultats bruts des outils de recherche, partagés par toutes les sessions du process
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL_HOURS", "24")) * 3600
+serper_cache = SingleFlightCache(ttl=SEARCH_CACHE_TTL)
+website_search_cache = SingleFlightCache(ttl=SEARCH_CACHE_TTL)
+
+# Sessions HTTP keep-alive vers Serper, une par clé API
+serper_sessions = ClientPool(int(os.getenv("HTTP_POOL_SIZE", "64")))
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def normalize_query(query):
+    """« Netflix  Culture values » et « netflix culture values » donnent la même clé."""
+    return " ".join(str(query or "").casefold().split())
+
+
+class CVReadToolSchema(BaseModel):
+    """Aucun argument : le CV est lié à l'outil à sa création."""
+
+
+class CVReadTool(BaseTool):
+    """Outil de lecture du CV lié au texte markdown d'une session.
+
+    Remplace le FileReadTool branché sur un fichier partagé (cv_md.md) :
+    chaque session construit ses agents avec son propre CV en mémoire,
+    deux candidats simultanés ne peuvent donc plus s'écraser.
+    """
+
+    name: str = "Lire le CV du candidat"
+    description: str = "Renvoie le contenu complet du CV du candidat au format markdown. Aucun argument n'est nécessaire."
+    args_schema: type[BaseModel] = CVReadToolSchema
+    cv_text: str = ""
+
+    def _run(self, **kwargs: Any) -> str:
+        with tracing.span("tool", label="cv_read"):
+            if not self.cv_text:
+                return "Erreur : aucun CV n'a été chargé pour cette session."
+            return self.cv_text
+
+
+def _serper_session(api_key):
+    import requests
+
+    return serper_sessions.get(content_hash(api_key or ""), requests.Session)
+
+
+class CachedSerperDevTool(SerperDevTool):
+    """SerperDevTool dont les requêtes HTTP sont mémoïsées par requête normalisée.
+
+    Seul l'appel réseau est mis en cache (et relancé sur erreur passagère) :
+    le formatage des résultats reste celui de SerperDevTool. L'URL de l'API se surcharge avec SERPER_BASE_URL
+    (serveur Serper factice en local par exemple). La clé est celle de
+    l'instance (`api_key`, sinon SERPER_API_KEY) et les requêtes passent par
+    une session HTTP gardée par clé.
+    """
+
+    api_key: str = ""
+
+    def __init__(self, **kwargs: Any):
+        if os.getenv("SERPER_BASE_URL"):
+            kwargs.setdefault("base_url", os.environ["SERPER_BASE_URL"])
+        super().__init__(**kwargs)
+
+    def _make_api_request(self, search_query: str, search_type: str) -> dict[str, Any]:
+        key = (
+            self.base_url,
+            search_type.lower(),
+            normalize_query(search_query),
+            self.n_results,
+            self.country,
+            self.location,
+            self.locale,
+        )
+        with tracing.span("tool", label="serper", search_type=search_type, query=normalize_query(search_query)):
+            return serper_cache.get_or_call(
+                key,
+                lambda: retry.call_with_retry(lambda: self._post(search_query, search_type), "Recherche Serper"),
+            )
+
+    def _post(self, search_query, search_type):
+        """Même requête que SerperDevTool._make_api_request, avec la clé et la session de l'instance."""
+        payload = {"q": search_query, "num": self.n_results}
+        if self.country != "":
+            payload["gl"] = self.country
+        if self.location != "":
+            payload["location"] = self.location
+        if self.locale != "":
+            payload["hl"] = self.locale
+        api_key = self.api_key or os.environ["SERPER_API_KEY"]
+        response = _serper_session(api_key).post(
+            self._get_search_url(search_type),
+            headers={"X-API-KEY": api_key, "content-type": "application/json"},
+            json=payload,
+            timeout=10,
+        )
+        response.raise_for_status()
+        results = response.json()
+        if not results:
+            raise ValueError("Empty response from Serper API")
+        return results
+
+
+class CachedWebsiteSearchTool(WebsiteSearchTool):
+    """WebsiteSearchTool mémoïsé par (site, requête normalisée).
+
+    Un succès évite à la fois l'indexation du site et la recherche sémantique.
+    Sans site explicite, la recherche porte sur l'index propre à l'instance :
+    le résultat n'est alors pas partagé.
+    """
+
+    @classmethod
+    def for_key(cls, api_key=None):
+        """Outil dont les embeddings OpenAI utilisent `api_key` (sinon OPENAI_API_KEY)."""
+        if not api_key:
+            return cls()
+        return cls(config={
+            "embedding_model": {"provider": "openai", "config": {"api_key": api_key, "model_name": EMBEDDING_MODEL}},
+        })
+
+    def _run(  # type: ignore[override]
+        self,
+        search_query: str,
+        website: str | None = None,
+        similarity_threshold: float | None = None,
+        limit: int | None = None,
+    ) -> str:
+        with tracing.span("tool", label="website_search", website=website or ""):
+            if website is None:
+                return super()._run(
+                    search_query, similarity_threshold=similarity_threshold, limit=limit
+                )
+            key = (website, normalize_query(search_query), similarity_threshold, limit)
+            return website_search_cache.get_or_call(
+                key,
+                lambda: super(CachedWebsiteSearchTool, self)._run(
+                    search_query,
+                    website=website,
+                    similarity_threshold=similarity_threshold,
+                    limit=limit,
+                ),
+            )
+
+
+def search_cache_stats():
+    """Appels réels et appels évités, par outil."""
+    return {
+        "serper": serper_cache.stats(),
+        "website_search": website_search_cache.stats(),
+    }
@@ -0,0 +1,269 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from usage import usage_delta, usage_snapshot
+
+
+# Destination des spans : "none" (défaut, métriques seulement), "log", "file" ou "otel"
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(tempfile.gettempdir(), "traces.jsonl"))
+
+# Lignes JSON de métriques (file d'attente) dans les logs : Streamlit n'a pas de /metrics
+METRICS_LOG = os.getenv("METRICS_LOG", "1").lower() not in ("0", "false", "no")
+
+# Bornes (secondes) des histogrammes de durée exposés au format Prometheus
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300)
+
+logger = logging.getLogger("cover_letter.trace")
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """Une opération chronométrée, rattachée à la requête (correlation id) en cours."""
+
+    def __init__(self, name, label=None, attributes=None):
+        parent = _current_span.get()
+        self.name = name
+        self.label = label or ""
+        self.attributes = dict(attributes or {})
+        self.trace_id = _request_id.get() or ""
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+        self._start = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "label": self.label,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 1),
+            "status": self.status,
+            "error": self.error,
+            **self.attributes,
+        }
+
+
+class Metrics:
+    """Histogrammes de durée et compteurs d'erreurs par (span, label), plus des jauges et compteurs nommés."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._series = {}
+        self._gauges = {}
+        self._counters = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def add_collector(self, fn):
+        """`fn()` est appelée avant chaque rendu pour mettre à jour des jauges (statistiques de cache...)."""
+        with self._lock:
+            self._collectors.append(fn)
+
+    def set_gauge(self, name, value, description=""):
+        """Valeur instantanée exposée sous cover_letter_<name> (profondeur de file...)."""
+        with self._lock:
+            self._gauges[name] = (value, description)
+
+    def increment(self, name, description=""):
+        """Compteur exposé sous cover_letter_<name>_total."""
+        with self._lock:
+            count, _ = self._counters.get(name, (0, description))
+            self._counters[name] = (count + 1, description)
+
+    def observe(self, name, label, seconds, error=False):
+        with self._lock:
+            series = self._series.setdefault((name, label), {
+                "buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0, "errors": 0,
+            })
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["buckets"][index] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+            series["errors"] += int(error)
+
+    def render(self):
+        """Texte au format d'exposition Prometheus."""
+        with self._lock:
+            collectors = list(self._collectors)
+        for collect in collectors:
+            collect()
+        lines = [
+            "# HELP cover_letter_span_duration_seconds Durée des opérations instrumentées",
+            "# TYPE cover_letter_span_duration_seconds histogram",
+        ]
+        errors = [
+            "# HELP cover_letter_span_errors_total Opérations terminées en erreur",
+            "# TYPE cover_letter_span_errors_total counter",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+            for (name, label), data in series:
+                labels = f'span="{name}",label="{label}"'
+                for bound, count in zip(self.buckets, data["buckets"]):
+                    lines.append(f'cover_letter_span_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'cover_letter_span_duration_seconds_bucket{{{labels},le="+Inf"}} {data["count"]}')
+                lines.append(f"cover_letter_span_duration_seconds_sum{{{labels}}} {data['sum']:.6f}")
+                lines.append(f"cover_letter_span_duration_seconds_count{{{labels}}} {data['count']}")
+                errors.append(f"cover_letter_span_errors_total{{{labels}}} {data['errors']}")
+            named = []
+            for name, (value, description) in sorted(self._gauges.items()):
+                named += [f"# HELP cover_letter_{name} {description}", f"# TYPE cover_letter_{name} gauge",
+                          f"cover_letter_{name} {value}"]
+            for name, (count, description) in sorted(self._counters.items()):
+                named += [f"# HELP cover_letter_{name}_total {description}", f"# TYPE cover_letter_{name}_total counter",
+                          f"cover_letter_{name}_total {count}"]
+        return "\n".join(lines + errors + named) + "\n"
+
+
+metrics = Metrics()
+_file_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _otel_tracer():
+    """Tracer OpenTelemetry exporté en OTLP/HTTP (OTEL_EXPORTER_OTLP_ENDPOINT...)."""
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "cover-letter")}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    return provider.get_tracer("cover_letter")
+
+
+@functools.lru_cache(maxsize=1)
+def _log_handler():
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def _export(span):
+    if TRACE_EXPORTER == "log":
+        _log_handler()
+        logger.info(json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+    elif TRACE_EXPORTER == "file":
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with _file_lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+@contextmanager
+def request(request_id=None):
+    """Définit l'identifiant de corrélation des spans du bloc.
+
+    Sans identifiant explicite, garde celui de la requête englobante s'il
+    existe (un job déjà identifié), sinon en crée un.
+    """
+    request_id = request_id or _request_id.get() or uuid.uuid4().hex
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+@contextmanager
+def span(name, label=None, **attributes):
+    """Chronomètre le bloc : métriques toujours, export selon TRACE_EXPORTER."""
+    current = Span(name, label, attributes)
+    token = _current_span.set(current)
+    otel = _otel_tracer().start_as_current_span(name) if TRACE_EXPORTER == "otel" else None
+    otel_span = otel.__enter__() if otel else None
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end()
+        _current_span.reset(token)
+        metrics.observe(name, current.label, current.duration, error=current.status == "error")
+        if otel_span is not None:
+            otel_span.set_attributes({
+                key: value for key, value in current.to_dict().items()
+                if isinstance(value, (str, bool, int, float))
+            })
+            otel.__exit__(None, None, None)
+        _export(current)
+
+
+def wrap(fn):
+    """Fait suivre la requête et le span en cours à `fn` exécutée dans un autre thread.
+
+    Les ThreadPoolExecutor ne propagent pas les contextvars : le contexte est
+    capturé ici et recopié à chaque appel (un même contexte ne peut pas être
+    actif dans deux threads à la fois).
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+def instrument_llm(llm):
+    """Entoure chaque appel du LLM d'un span « llm.call » avec les tokens consommés."""
+    call = llm.call
+
+    @functools.wraps(call)
+    def traced_call(*args, **kwargs):
+        with span("llm.call", label=llm.model) as current:
+            before = usage_snapshot(llm)
+            try:
+                return call(*args, **kwargs)
+            finally:
+                delta = usage_delta(before, usage_snapshot(llm))
+                current.set(prompt_tokens=delta["prompt_tokens"], completion_tokens=delta["completion_tokens"])
+
+    llm.call = traced_call
+    return llm
+
+
+def metrics_text():
+    return metrics.render()
+
+
+def log_metrics(event, **values):
+    """Journalise une ligne JSON de métriques (file d'attente...), pour les process sans /metrics.
+
+    METRICS_LOG=0 désactive ces lignes.
+    """
+    if not METRICS_LOG:
+        return
+    _log_handler()
+    logger.info(json.dumps({"metric": event, "time": time.time(), **values}, ensure_ascii=False))
@@ -0,0 +1,154 @@
+import os
+import threading
+
+
+# Prix publics en USD par million de tokens (prompt, completion), pour l'estimation
+MODEL_PRICES = {
+    "gpt-5": (1.25, 10.00),
+    "gpt-5-mini": (0.25, 2.00),
+    "gpt-5-nano": (0.05, 0.40),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+# Providers des serveurs locaux (utils.LOCAL_BASE_URLS) : pas de coût d'API
+LOCAL_PROVIDERS = ("ollama", "llamacpp", "vllm", "local")
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens", "successful_requests")
+
+
+class BudgetExceededError(TimeoutError):
+    """Le budget de tokens ou de coût de la génération est dépassé.
+
+    Hérite de TimeoutError : c'est la seule erreur que CrewAI propage sans
+    relancer la tâche (une relance consommerait encore des tokens).
+    """
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Coût estimé en USD, ou None si le modèle n'a pas de prix connu.
+
+    Un modèle préfixé par un provider local (« ollama/qwen2.5 ») ne coûte rien.
+    """
+    if (model or "").split("/")[0] in LOCAL_PROVIDERS:
+        return 0.0
+    prices = MODEL_PRICES.get((model or "").split("/")[-1])
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+def sum_costs(costs):
+    """Somme des coûts, None si l'un d'eux est inconnu."""
+    costs = list(costs)
+    return None if any(cost is None for cost in costs) else sum(costs)
+
+
+def llm_model(llm):
+    """Modèle d'un LLM pour le calcul du coût, préfixé par son provider s'il en a un propre."""
+    return getattr(llm, "model_id", None) or llm.model
+
+
+def usage_snapshot(llm):
+    """Compteurs de tokens cumulés d'un LLM CrewAI (dict)."""
+    summary = llm.get_token_usage_summary()
+    return {field: getattr(summary, field, 0) for field in USAGE_FIELDS}
+
+
+def usage_delta(before, after):
+    return {field: after[field] - before[field] for field in USAGE_FIELDS}
+
+
+def add_usage(total, usage):
+    for field in USAGE_FIELDS:
+        total[field] = total.get(field, 0) + usage.get(field, 0)
+    return total
+
+
+class UsageTracker:
+    """Suivi des tokens d'une génération et garde-fou de budget.
+
+    Chaque tâche enregistre sa consommation (record). `check` compare le
+    total courant des LLM de la génération au budget et lève
+    BudgetExceededError : appelée à chaque étape d'agent, elle arrête la
+    génération en cours de route. Budget à 0 ou None : pas de limite.
+    """
+
+    def __init__(self, model, max_tokens=None, max_cost=None):
+        self.model = model
+        self.max_tokens = max_tokens or None
+        self.max_cost = max_cost or None
+        self.tasks = {}
+        self._llms = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, model, budget=None):
+        """Budget explicite (dict max_tokens/max_cost) ou MAX_TOKENS_PER_RUN / MAX_COST_PER_RUN."""
+        budget = budget or {}
+        return cls(
+            model,
+            max_tokens=budget.get("max_tokens") or int(os.getenv("MAX_TOKENS_PER_RUN", "0")),
+            max_cost=budget.get("max_cost") or float(os.getenv("MAX_COST_PER_RUN", "0")),
+        )
+
+    def watch(self, llm):
+        """Ajoute un LLM dont la consommation compte dans le budget."""
+        with self._lock:
+            if all(llm is not known for known, _ in self._llms):
+                self._llms.append((llm, usage_snapshot(llm)))
+
+    def record(self, task_name, agent_name, usage, model=None):
+        """Consommation d'une tâche, chiffrée au prix de `model` (celui de la génération par défaut)."""
+        usage = dict(usage)
+        model = model or self.model
+        usage["cost"] = estimate_cost(model, usage["prompt_tokens"], usage["completion_tokens"])
+        with self._lock:
+            self.tasks[task_name] = {"agent": agent_name, "model": model, **usage}
+
+    def _llm_usages(self):
+        with self._lock:
+            return [(llm_model(llm), usage_delta(start, usage_snapshot(llm))) for llm, start in self._llms]
+
+    def current_usage(self):
+        total = {}
+        for _, usage in self._llm_usages():
+            add_usage(total, usage)
+        return total
+
+    def check(self):
+        usages = self._llm_usages()
+        tokens = sum(usage.get("total_tokens", 0) for _, usage in usages)
+        if self.max_tokens and tokens > self.max_tokens:
+            raise BudgetExceededError(f"Budget de tokens dépassé : {tokens} > {self.max_tokens}")
+        if self.max_cost:
+            # Chaque LLM au prix de son propre modèle (agents sur un serveur local : gratuits)
+            cost = sum_costs(
+                estimate_cost(model, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+                for model, usage in usages
+            )
+            if cost is not None and cost > self.max_cost:
+                raise BudgetExceededError(f"Budget dépassé : {cost:.4f} $ > {self.max_cost:.4f} $")
+
+    def summary(self):
+        """Consommation par tâche, par agent et totale, avec coût estimé."""
+        with self._lock:
+            tasks = {name: dict(usage) for name, usage in self.tasks.items()}
+        agents = {}
+        costs = {}
+        total = {}
+        for usage in tasks.values():
+            add_usage(agents.setdefault(usage["agent"], {}), usage)
+            costs.setdefault(usage["agent"], []).append(usage["cost"])
+            add_usage(total, usage)
+        for agent, usage in agents.items():
+            usage["cost"] = sum_costs(costs[agent])
+        total["cost"] = sum_costs(usage["cost"] for usage in tasks.values())
+        return {"model": self.model, "tasks": tasks, "agents": agents, "total": total}
+
+
+def format_cost(cost):
+    return "n/d" if cost is None else f"{cost:.4f} $"
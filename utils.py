@@ -1,132 +1,496 @@
 import os
 import pathlib
-import pymupdf
-import pymupdf4llm
 import streamlit as st
-from crewai import Agent
-from crewai_tools import WebsiteSearchTool, SerperDevTool, FileReadTool
-#export en .docx
-from io import BytesIO
-from docx import Document
-from docx.shared import Pt
 import re
+import threading
+from functools import lru_cache
+from importlib.metadata import version
+from cache import (
+    ClientPool, LRUCache, SingleFlightCache, content_hash, make_checkpoint_store, make_research_cache,
+    normalize_company,
+)
+import conversion
+import streaming
+import tracing
 
+# Les dépendances lourdes (crewai, crewai_tools, pymupdf, pymupdf4llm, docx) sont
+# importées dans les fonctions qui s'en servent : la page d'accueil et les reruns
+# Streamlit ne les paient pas. warm_up() permet de les précharger en arrière-plan.
+HEAVY_MODULES = ("crewai", "crewai_tools", "tools", "pymupdf", "pymupdf4llm", "docx")
 
 
+# Cache des conversions CV -> markdown, partagé par toutes les sessions du process.
+# CV_CACHE_DIR active un second niveau sur disque (optionnel), borné à CV_CACHE_DISK_SIZE fichiers.
+cv_cache = LRUCache(
+    maxsize=int(os.getenv("CV_CACHE_SIZE", "64")),
+    disk_dir=os.getenv("CV_CACHE_DIR") or None,
+    disk_maxsize=int(os.getenv("CV_CACHE_DISK_SIZE", "1000")),
+)
+CV_CACHE_GAUGES = {
+    "entries": "CV convertis en mémoire",
+    "disk_entries": "CV convertis sur disque",
+    "hits": "Conversions servies par la mémoire",
+    "disk_hits": "Conversions servies par le disque",
+    "misses": "Conversions absentes du cache",
+}
 
-def convert_cv_to_md(uploaded_file, output_path="cv_md.md"):
-    """Convertit un CV uploadé (PDF/DOCX/MD) en markdown."""
+
+def _export_cv_cache_stats():
+    for name, value in cv_cache.stats().items():
+        tracing.metrics.set_gauge(f"cv_cache_{name}", value, CV_CACHE_GAUGES[name])
+
+
+tracing.metrics.add_collector(_export_cv_cache_stats)
+
+
+# Rapports de culture d'entreprise partagés entre sessions (SQLite local par défaut)
+research_cache = make_research_cache()
+
+# Sorties des tâches terminées, pour reprendre une génération échouée
+checkpoint_store = make_checkpoint_store()
+
+# Générations complètes (lettre, brouillon, usage) : une soumission identique,
+# terminée ou en cours, renvoie le même résultat (voir generation_cache_key)
+result_cache = SingleFlightCache(
+    ttl=float(os.getenv("RESULT_CACHE_TTL_HOURS", "24")) * 3600,
+    maxsize=int(os.getenv("RESULT_CACHE_SIZE", "256")),
+)
+
+
+@lru_cache(maxsize=1)
+def converter_version():
+    """Versions de PyMuPDF/pymupdf4llm, lues dans les métadonnées sans importer les modules."""
+    return f"pymupdf-{version('PyMuPDF')}/pymupdf4llm-{version('pymupdf4llm')}"
+
+def cv_cache_key(data, file_extension):
+    """Clé de cache : SHA-256 du contenu uploadé + format + version du convertisseur + pages converties."""
+    return content_hash(data, file_extension, converter_version(), f"pages-{conversion.MAX_PAGES}")
+
+def warm_up(background=True):
+    """Précharge les dépendances lourdes (hook de démarrage du conteneur, WARMUP=1)."""
+    import importlib
+
+    def _import_all():
+        for module in HEAVY_MODULES:
+            importlib.import_module(module)
+        # Modèle Word stylé, construit une fois pour tous les exports
+        importlib.import_module("export")._docx_template()
+        # Processus de conversion des CV lancés avant le premier upload
+        conversion.start()
+
+    if not background:
+        _import_all()
+        return None
+    thread = threading.Thread(target=_import_all, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def convert_cv_bytes(data, filename):
+    """Convertit le contenu d'un CV (PDF/DOCX/MD) en markdown, entièrement en mémoire.
+
+    Aucun fichier n'est écrit sur le disque : le texte est renvoyé à l'appelant
+    qui le garde dans sa session, ce qui isole les candidats servis en
+    parallèle par la même instance. Lève ValueError si le format n'est pas
+    supporté ou si le fichier ne se convertit pas dans les limites du module
+    conversion (pages, temps, mémoire).
+    """
+    return convert_cv(data, filename)[0]
+
+def convert_cv(data, filename):
+    """Comme convert_cv_bytes, renvoie (markdown, informations de conversion).
+
+    Les informations (pages, pages converties, mode) sont None pour un .md
+    ou un CV déjà en cache.
+    """
+    file_extension = pathlib.Path(filename).suffix.lower()
+    with tracing.span("cv.conversion", label=file_extension.lstrip("."), size=len(data)) as span:
+        md_text, info = _convert_cv_bytes(data, file_extension, span)
+        span.set(chars=len(md_text), **(info or {}))
+        return md_text, info
+
+def _convert_cv_bytes(data, file_extension, span):
+    if file_extension == '.md':
+        return data.decode("utf-8"), None
+
+    # Même CV déjà converti (régénération, autre session) : simple lookup
+    key = cv_cache_key(data, file_extension)
+    md_text = cv_cache.get(key)
+    span.set(cache_hit=md_text is not None)
+    if md_text is not None:
+        return md_text, None
+
+    # Dans un processus du pool, hors du GIL des sessions Streamlit
+    md_text, info = conversion.convert(data, file_extension)
+
+    # Un repli sur le texte brut dépend de la charge du moment : pas mis en cache,
+    # la prochaine tentative peut obtenir la mise en page
+    if info["mode"] == conversion.LAYOUT:
+        cv_cache.set(key, md_text)
+    return md_text, info
+
+def convert_cv_to_md(uploaded_file):
+    """Convertit un CV uploadé dans Streamlit en markdown (None en cas d'erreur)."""
     try:
-        file_extension = pathlib.Path(uploaded_file.name).suffix.lower()
-        
-        if file_extension == '.pdf':
-            # Sauvegarder temporairement
-            temp_path = f"{uploaded_file.name}"
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.getvalue())
-            
-            # Convertir
-            md_text = pymupdf4llm.to_markdown(temp_path)
-            pathlib.Path(output_path).write_bytes(md_text.encode("utf-8"))
-            
-            # Nettoyer
-            os.remove(temp_path)
-            
-        elif file_extension == '.docx':
-            temp_path = f"{uploaded_file.name}"
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.getvalue())
-            
-            # Convertir via PyMuPDF
-            doc = pymupdf.open(temp_path)
-            pdf_bytes = doc.convert_to_pdf()
-            pdf_doc = pymupdf.open("pdf", pdf_bytes)
-            md_text = pymupdf4llm.to_markdown(pdf_doc)
-            pathlib.Path(output_path).write_bytes(md_text.encode("utf-8"))
-            
-            # Nettoyer
-            os.remove(temp_path)
-            
-        elif file_extension == '.md':
-            # Directement sauvegarder
-            pathlib.Path(output_path).write_bytes(uploaded_file.getvalue())
-            
-        else:
-            raise ValueError(f"Format non supporté: {file_extension}")
-            
-        return output_path
-        
+        md_text, info = convert_cv(uploaded_file.getvalue(), uploaded_file.name)
     except Exception as e:
         st.error(f"Erreur de conversion: {str(e)}")
         return None
+    if info and info["pages_converties"] < info["pages"]:
+        st.warning(f"CV de {info['pages']} pages : seules les {info['pages_converties']} premières sont utilisées.")
+    if info and info["mode"] == conversion.TEXT:
+        st.info("Mise en page du CV trop longue à analyser : texte brut utilisé (titres et listes non détectés).")
+    return md_text
+
+# Configurations YAML parsées, invalidées quand le fichier change (mtime)
+_yaml_cache = {}
+_yaml_lock = threading.Lock()
 
-def load_agents_from_yaml(yaml_path, temperatures, context=None):
-    """Charge les agents depuis YAML avec températures dynamiques."""
+def load_yaml_config(path):
+    """Renvoie le contenu parsé d'un fichier YAML, relu seulement s'il a changé.
+
+    La valeur est partagée entre requêtes : les appelants ne doivent pas la
+    modifier (voir _format_fields).
+    """
     import yaml
+
+    mtime = os.stat(path).st_mtime_ns
+    with _yaml_lock:
+        entry = _yaml_cache.get(path)
+        if entry and entry[0] == mtime:
+            return entry[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    with _yaml_lock:
+        _yaml_cache[path] = (mtime, config)
+    return config
+
+def _format_fields(config, keys, context):
+    """Copie de `config` dont les champs `keys` sont formatés avec le contexte."""
+    formatted = dict(config)
+    for key in keys:
+        if key in formatted and isinstance(formatted[key], str):
+            formatted[key] = formatted[key].format(**context)
+    return formatted
+
+# Outils coûteux à construire (WebsiteSearchTool initialise un backend RAG/embeddings),
+# réutilisés d'une requête à l'autre pour une même clé API
+TOOL_POOL_SIZE = 32
+tool_pool = ClientPool(TOOL_POOL_SIZE)
+
+def get_pooled_tool(tool_name, factory, api_key=""):
+    """Renvoie l'instance partagée de `tool_name` pour cette clé API (créée au besoin)."""
+    return tool_pool.get((tool_name, content_hash(api_key or "")), factory)
+
+# Clients HTTP des LLM OpenAI (connexions keep-alive), un par clé API et URL
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "64"))
+http_clients = ClientPool(HTTP_POOL_SIZE)
+
+def get_http_client(api_key, base_url=None):
+    """Client httpx partagé par les LLM d'une même clé API.
+
+    Les connexions (TLS compris) sont réutilisées d'un agent et d'une
+    génération à l'autre au lieu d'être rouvertes à chaque LLM.
+    """
+    from openai import DefaultHttpxClient
+
+    return http_clients.get(("openai", content_hash(api_key or ""), base_url or ""), DefaultHttpxClient)
+
+def session_key(credentials, name, env_var):
+    """Clé API de la session (`credentials`), sinon celle de l'environnement du process."""
+    return (credentials or {}).get(name) or os.getenv(env_var)
+
+# Modèles de raisonnement qui n'acceptent que la température par défaut
+FIXED_TEMPERATURE_MODELS = ("gpt-5", "o1", "o3", "o4")
+
+DEFAULT_MODEL = "gpt-5-mini"
+
+def default_model():
+    return os.getenv("OPENAI_MODEL_NAME") or DEFAULT_MODEL
+
+# Serveurs locaux compatibles OpenAI (llm.provider dans agents.yaml) et leur URL par défaut
+LOCAL_BASE_URLS = {
+    "ollama": "http://localhost:11434/v1",
+    "llamacpp": "http://localhost:8080/v1",
+    "vllm": "http://localhost:8000/v1",
+    "local": None,
+}
+
+def _uses_openai_client(provider, model):
+    if provider:
+        return provider == "openai" or provider in LOCAL_BASE_URLS
+    return "/" not in model or model.startswith("openai/")
+
+def build_llm(model=None, temperature=None, stream=False, provider=None, base_url=None, api_key=None):
+    """LLM dédié à un agent : chaque agent a ses propres compteurs de tokens.
+
+    `stream` : réponse reçue jeton par jeton (voir streaming.capture).
+    `provider` / `base_url` : backend propre à l'agent (clé `llm:` de
+    agents.yaml). Un serveur local compatible OpenAI (Ollama, llama.cpp,
+    vLLM) passe par le client OpenAI natif de CrewAI, avec la clé
+    LOCAL_LLM_API_KEY (la plupart des serveurs locaux l'ignorent).
+    `api_key` : clé OpenAI de la session, passée au client du LLM (sinon
+    OPENAI_API_KEY). Les clients OpenAI partagent un pool de connexions
+    par clé (get_http_client).
+    """
+    from crewai import LLM
+
+    model = model or default_model()
+    if model.split("/")[-1].startswith(FIXED_TEMPERATURE_MODELS):
+        temperature = None
+    options = {}
+    if provider in LOCAL_BASE_URLS:
+        options = {
+            "provider": "openai",
+            "base_url": base_url or LOCAL_BASE_URLS[provider],
+            "api_key": os.getenv("LOCAL_LLM_API_KEY", "local"),
+        }
+    elif provider:
+        options["provider"] = provider
+    if base_url and "base_url" not in options:
+        options["base_url"] = base_url
+    if _uses_openai_client(provider, model):
+        options.setdefault("api_key", api_key or os.getenv("OPENAI_API_KEY"))
+        options["client_params"] = {
+            "http_client": get_http_client(options["api_key"], options.get("base_url") or os.getenv("OPENAI_BASE_URL")),
+        }
+    llm = LLM(model=model, temperature=temperature, stream=stream, **options)
+    # Backend d'origine, pour clone_llm et le coût (usage.llm_model)
+    llm.backend = {"provider": provider, "base_url": base_url, "api_key": api_key}
+    llm.model_id = f"{provider}/{model}" if provider else model
+    if stream:
+        streaming.count_usage(llm)
+    return tracing.instrument_llm(llm)
+
+def clone_llm(llm, stream=None):
+    """Nouveau LLM de même configuration, avec des compteurs de tokens à zéro."""
+    return build_llm(
+        llm.model, llm.temperature, getattr(llm, "stream", False) if stream is None else stream,
+        **getattr(llm, "backend", {}),
+    )
+
+def agent_llm_config(agent_name, config, overrides=None):
+    """Backend du LLM d'un agent : clé `llm:` de agents.yaml, surchargée par `overrides`.
+
+    Renvoie un dict {provider, model, base_url} (valeurs absentes : None,
+    c'est-à-dire le modèle de la session sur l'API OpenAI). Lève ValueError
+    pour un provider local sans URL.
+    """
+    spec = {"provider": None, "model": None, "base_url": None}
+    for source in (config.get("llm") or {}, (overrides or {}).get(agent_name) or {}):
+        unknown = set(source) - set(spec)
+        if unknown:
+            raise ValueError(f"Agent '{agent_name}' : clé llm inconnue {', '.join(sorted(unknown))}")
+        spec.update({key: value for key, value in source.items() if value is not None})
+    if spec["provider"] in LOCAL_BASE_URLS and not (spec["base_url"] or LOCAL_BASE_URLS[spec["provider"]]):
+        raise ValueError(f"Agent '{agent_name}' : base_url requis pour le provider '{spec['provider']}'")
+    if spec["provider"] in LOCAL_BASE_URLS and not spec["model"]:
+        raise ValueError(f"Agent '{agent_name}' : modèle requis pour le provider '{spec['provider']}'")
+    return spec
+
+def load_agents_from_yaml(yaml_path, temperatures, context=None, cv_text="", model=None, llms=None,
+                          credentials=None):
+    """Charge les agents depuis YAML avec températures dynamiques.
+
+    `cv_text` est le markdown du CV de la session : l'outil CVReadTool
+    des agents qui en ont besoin est lié à ce texte. Chaque agent reçoit
+    son propre LLM (`model`, OPENAI_MODEL_NAME par défaut) pour que la
+    consommation de tokens soit comptée par agent. La clé `llm:` d'un agent
+    (provider, model, base_url) lui donne un autre backend, par exemple un
+    serveur Ollama local ; `llms` (nom d'agent -> même dict) la surcharge.
+    `credentials` ({"openai_api_key", "serper_api_key"}) : clés de la
+    session, passées explicitement aux LLM et aux outils de recherche ;
+    rien n'est lu ni écrit dans os.environ quand elles sont fournies.
+    """
     from crewai import Agent
+    from tools import CVReadTool, CachedSerperDevTool, CachedWebsiteSearchTool
     
-    with open(yaml_path, 'r', encoding='utf-8') as f:
-        agents_config = yaml.safe_load(f)
+    agents_config = load_yaml_config(yaml_path)
 
     context = context or {}
     
-    # Map tool names to actual tool instances
+    openai_key = session_key(credentials, "openai_api_key", "OPENAI_API_KEY")
+    serper_key = session_key(credentials, "serper_api_key", "SERPER_API_KEY")
+
+    # Map tool names to actual tool instances (les outils de recherche sont mutualisés par clé API)
     tools_map = {
-        "WebsiteSearchTool": WebsiteSearchTool(),
-        "SerperDevTool": SerperDevTool(),
-        "FileReadTool": FileReadTool(file_path="cv_md.md")
+        "WebsiteSearchTool": get_pooled_tool(
+            "WebsiteSearchTool", lambda: CachedWebsiteSearchTool.for_key(openai_key), openai_key
+        ),
+        "SerperDevTool": get_pooled_tool("SerperDevTool", lambda: CachedSerperDevTool(api_key=serper_key or ""), serper_key),
+        "CVReadTool": CVReadTool(cv_text=cv_text)
     }
     
     agents = {}
     for agent_name, config in agents_config.items():
 
-        # Formater les strings avec le contexte (candidate_profile)
-        for key in ['role', 'goal', 'backstory']:
-            if key in config and isinstance(config[key], str):
-                config[key] = config[key].format(**context)
+        # Formater les strings avec le contexte (candidate_profile), sans toucher au YAML en cache
+        config = _format_fields(config, ['role', 'goal', 'backstory'], context)
         
         # Map tool names to actual tool instances
         agent_tools = [tools_map[tool] for tool in config.get("tools", []) if tool in tools_map]
+        llm_config = agent_llm_config(agent_name, config, llms)
         
         agents[agent_name] = Agent(
             role=config["role"],
             goal=config["goal"],
             backstory=config["backstory"],
             tools=agent_tools,  # ✅ Pass the actual tool instances
+            llm=build_llm(
+                llm_config["model"] or model, temperatures.get(agent_name, 0.5),
+                provider=llm_config["provider"], base_url=llm_config["base_url"], api_key=openai_key,
+            ),
             temperature=temperatures.get(agent_name, 0.5),
             verbose=config.get("verbose", True),
             max_iter=config.get("max_iter", 3),
+            # Les relances sont faites par pipeline (backoff, plafond par génération)
+            max_retry_limit=config.get("max_retry_limit", 0),
             allow_delegation=config.get("allow_delegation", False)
         )
     
     return agents
 
-def load_tasks_from_yaml(filepath, context=None):
-    import yaml
+def build_task_graph(tasks_config, agent_names=None, skip=()):
+    """Valide le graphe déclaré dans tasks.yaml et le découpe en étapes parallèles.
+
+    Chaque tâche déclare `agent:` et `context: [...]` (les tâches dont elle
+    lit la sortie). Lève ValueError si un agent ou une tâche de contexte
+    n'existe pas, ou si le graphe contient un cycle. Les tâches de `skip`
+    sont retirées (mode rapide par exemple) ; aucune tâche restante ne doit
+    en dépendre.
+
+    Renvoie (dependencies, stages) : le contexte de chaque tâche retenue, et
+    la liste des étapes, chaque étape regroupant les tâches dont toutes les
+    dépendances sont dans les étapes précédentes (parallélisme maximal).
+    """
+    dependencies = {}
+    for name, config in tasks_config.items():
+        if name in skip:
+            continue
+        agent_name = config.get("agent")
+        if not agent_name:
+            raise ValueError(f"Tâche '{name}' : aucun agent déclaré")
+        if agent_names is not None and agent_name not in agent_names:
+            raise ValueError(f"Tâche '{name}' : agent inconnu '{agent_name}'")
+        context_names = list(config.get("context") or [])
+        for dep in context_names:
+            if dep in skip:
+                raise ValueError(f"Tâche '{name}' : dépend de la tâche ignorée '{dep}'")
+            if dep not in tasks_config:
+                raise ValueError(f"Tâche '{name}' : tâche de contexte inconnue '{dep}'")
+        dependencies[name] = context_names
+
+    # Découpage par niveaux (Kahn) en gardant l'ordre du fichier dans chaque étape
+    stages = []
+    done = set()
+    remaining = list(dependencies)
+    while remaining:
+        stage = [name for name in remaining if all(dep in done for dep in dependencies[name])]
+        if not stage:
+            raise ValueError(f"Cycle dans le graphe des tâches : {', '.join(remaining)}")
+        stages.append(stage)
+        done.update(stage)
+        remaining = [name for name in remaining if name not in done]
+
+    return dependencies, stages
+
+def load_tasks_from_yaml(filepath, context=None, agents=None, skip=()):
+    """Charge les tâches et leur graphe depuis YAML.
+
+    Les agents (dict nom -> Agent) sont assignés d'après le champ `agent:`
+    et les dépendances d'après `context:`. Renvoie (tasks, stages) : les
+    tâches par nom (dans l'ordre d'exécution) et les étapes calculées par
+    build_task_graph.
+    """
     from crewai import Task
-    from textwrap import dedent
     
     context = context or {}
     
-    with open(filepath, 'r') as f:
-        tasks_config = yaml.safe_load(f)
+    tasks_config = load_yaml_config(filepath)
+
+    dependencies, stages = build_task_graph(
+        tasks_config, agent_names=agents.keys() if agents is not None else None, skip=skip
+    )
     
-    tasks = []
-    for name, config in tasks_config.items():
+    tasks = {}
+    for name in [name for stage in stages for name in stage]:
         # Formater les strings avec le contexte
-        for key in ['description', 'expected_output']:
-            if key in config and isinstance(config[key], str):
-                config[key] = config[key].format(**context)
+        config = _format_fields(tasks_config[name], ['description', 'expected_output'], context)
         
-        task = Task(
+        tasks[name] = Task(
+            name=name,
             description=config['description'],
             expected_output=config['expected_output'],
-            async_execution=config.get('async_execution', False),
-            agent=None  # Sera assigné plus tard
+            agent=agents[config['agent']] if agents is not None else None,
+            context=[tasks[dep] for dep in dependencies[name]],
         )
-        tasks.append(task)
     
-    return tasks
+    return tasks, stages
+
+def research_cache_key(company, agents_path="agents.yaml", tasks_path="tasks.yaml", model=None):
+    """Clé du rapport de recherche : entreprise normalisée + version des prompts + modèle.
+
+    Toute modification du prompt de company_culture_task ou du research_agent,
+    ou un changement de modèle, invalide naturellement les anciens rapports.
+    """
+    import yaml
+
+    agent_config = load_yaml_config(agents_path).get("research_agent", {})
+    task_config = load_yaml_config(tasks_path).get("company_culture_task", {})
+
+    prompt_version = yaml.safe_dump([agent_config, task_config], sort_keys=True)
+    return content_hash(
+        normalize_company(company),
+        prompt_version,
+        model or default_model(),
+    )
+
+def generation_cache_key(params, agents_path="agents.yaml", tasks_path="tasks.yaml"):
+    """Clé d'une génération complète : tout ce qui change la lettre, rien de la session.
+
+    CV (empreinte), entreprise normalisée, annonce, profil, genre, ton,
+    températures, modèles (global et par agent), brouillon inclus ou non,
+    mode de relecture et version de tous les prompts. Les clés API et le budget n'en font pas
+    partie : deux utilisateurs qui soumettent le même formulaire partagent
+    le résultat.
+    """
+    import json
+
+    import yaml
+
+    prompt_version = yaml.safe_dump([load_yaml_config(agents_path), load_yaml_config(tasks_path)], sort_keys=True)
+    return content_hash(
+        content_hash(params["cv_md"]),
+        normalize_company(params["company_url"]),
+        params["job_description"].strip(),
+        params["candidate_profile"].strip(),
+        params["gender"],
+        params.get("tone", ""),
+        json.dumps(params["temperatures"], sort_keys=True),
+        params.get("model") or default_model(),
+        json.dumps(params.get("agent_llms") or {}, sort_keys=True),
+        str(bool(params["include_draft"])),
+        params.get("review_mode") or "",
+        prompt_version,
+    )
+
+def restore_task_output(task, raw, agent):
+    """Renseigne la sortie d'une tâche depuis un cache, sans exécuter l'agent.
+
+    Les tâches qui l'ont en contexte reçoivent ce texte comme si la tâche
+    venait de tourner.
+    """
+    from crewai.tasks.task_output import TaskOutput
+
+    task.output = TaskOutput(
+        name=task.name,
+        description=task.description,
+        expected_output=task.expected_output,
+        raw=raw,
+        agent=agent.role,
+    )
+    return task.output
 
 # def create_docx(markdown_text):
 #     """
@@ -178,82 +542,11 @@ def load_tasks_from_yaml(filepath, context=None):
 #     bio.seek(0)
 #     return bio
 
-def _add_markdown_to_doc(doc, text):
-    """Fonction interne pour nettoyer et ajouter du markdown dans un objet docx"""
-    paragraphs = text.split('\n')
-    
-    for para in paragraphs:
-        if not para.strip():
-            continue
-            
-        clean_text = para.strip()
-        is_heading = False
-        
-        # Gestion Titres
-        if clean_text.startswith('#'):
-            clean_text = clean_text.lstrip('#').strip()
-            is_heading = True
-            
-        # Nettoyage gras basique
-        clean_text = clean_text.replace('**', '').replace('__', '')
-        
-        p = doc.add_paragraph(clean_text)
-        
-        if is_heading:
-            p.runs[0].bold = True
-            p.runs[0].font.size = Pt(12)
-            # Ajout d'un petit espacement après les titres
-            p.paragraph_format.space_after = Pt(6)
-
 def create_docx(final_text, draft_text=None, params=None):
-    """Génère le DOCX avec la version finale et optionnellement le brouillon."""
-    doc = Document()
-    
-    # Style global
-    style = doc.styles['Normal']
-    font = style.font
-    font.name = 'Calibri'
-    font.size = Pt(11)
-
-    # 1. Ajouter la version FINALE
-    doc.add_heading('Lettre de Motivation (Version Finale)', 0)
-    
-    doc.add_heading('Paramètres de la session', 0)
-    doc.add_paragraph("Voici les configurations utilisées pour générer cette lettre :")
-    
-    # Créer un tableau
-    table = doc.add_table(rows=1, cols=2)
-    table.style = 'Table Grid' # Ajoute des bordures visibles
-    
-    # En-tête du tableau
-    hdr_cells = table.rows[0].cells
-    hdr_cells[0].text = 'Paramètre'
-    hdr_cells[1].text = 'Valeur'
-    
-    # Remplir le tableau
-    for key, value in params.items():
-        row_cells = table.add_row().cells
-        row_cells[0].text = str(key)
-        # On convertit en string et on limite la longueur si c'est trop long (optionnel)
-        row_cells[1].text = str(value)
-
-    _add_markdown_to_doc(doc, final_text)
-
-    # 2. Ajouter le BROUILLON (si demandé)
-    if draft_text:
-        # Saut de page
-        doc.add_page_break()   
-        
-        doc.add_heading('Premier Jet (Version non-relue)', 0)
-        p = doc.add_paragraph("Ceci est la version brute générée par le rédacteur avant le passage du relecteur.")
-        p.italic = True
-        
-        _add_markdown_to_doc(doc, draft_text)
+    """Génère le DOCX de la lettre (voir export.create_docx)."""
+    import export
 
-    bio = BytesIO()
-    doc.save(bio)
-    bio.seek(0)
-    return bio
+    return export.create_docx(final_text, draft_text, params)
 
 
 